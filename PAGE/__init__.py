@@ -1 +1,8 @@
 from .read_page_xml import *
+from .read_corpus import *
+from .page_store import *
+from .corpus_store import *
+from .write_to_page import *
+from .column_detection import *
+from .relation_graph import *
+from .neighbours import *
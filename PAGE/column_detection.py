@@ -0,0 +1,108 @@
+from collections import namedtuple
+import numpy as np
+
+# Column detection from the horizontal projection profile of word boxes. The profile counts
+# the words covering each x position; runs of (near) empty positions between the first and
+# last word are gutters. Each gutter is scored on its width against the text size, on how
+# many words lie either side of it and on how far those words share the same vertical span,
+# which separates real columns from a wide gap in a single line or a heading above a table.
+
+columnBoundary = namedtuple('columnBoundary', 'position confidence gutter_left gutter_right')
+
+def projection_profile(lefts, rights, start=None, end=None):
+
+    # Number of boxes covering each x in [start, end), built from +1/-1 edge counts
+    lefts = np.asarray(lefts, dtype=np.int64)
+    rights = np.asarray(rights, dtype=np.int64)
+    if start is None:
+        start = int(lefts.min())
+    if end is None:
+        end = int(rights.max())
+    length = end-start
+    lefts = np.clip(lefts-start, 0, length)
+    rights = np.clip(rights-start, 0, length)
+    delta = np.bincount(lefts, minlength=length+1) - np.bincount(rights, minlength=length+1)
+    return np.cumsum(delta[:length])
+
+def find_gutters(profile, min_width=1, noise=0):
+
+    # (first, last+1) index pairs of the interior runs where the profile is at most noise
+    empty = np.concatenate(([False], profile <= noise, [False]))
+    change = np.diff(empty.astype(np.int8))
+    starts = np.flatnonzero(change == 1)
+    ends = np.flatnonzero(change == -1)
+    interior = (starts > 0) & (ends < len(profile)) & (ends-starts >= min_width)
+    return np.stack([starts[interior], ends[interior]], axis=1)
+
+def _span_overlap(tops_a, bottoms_a, tops_b, bottoms_b):
+
+    overlap = min(bottoms_a.max(), bottoms_b.max()) - max(tops_a.min(), tops_b.min())
+    span = min(bottoms_a.max()-tops_a.min(), bottoms_b.max()-tops_b.min())
+    if span <= 0:
+        return 0.0
+    return float(np.clip(overlap/span, 0, 1))
+
+def detect_columns(boxes, min_gutter=None, noise=0, min_words=3, min_confidence=0.0):
+
+    # boxes is an (N, 4) array in BoxCoords order (left, right, top, bottom). min_gutter
+    # defaults to the median word height; returns columnBoundary tuples sorted by position
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if len(boxes) < 2:
+        return []
+    left, right, top, bottom = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    text_size = max(float(np.median(bottom-top)), 1.0)
+    if min_gutter is None:
+        min_gutter = text_size
+
+    start = int(left.min())
+    profile = projection_profile(left, right, start, int(right.max()))
+    found = []
+    for g_start, g_end in find_gutters(profile, max(int(min_gutter), 1), noise):
+        gutter_left = start+int(g_start)
+        gutter_right = start+int(g_end)
+        on_left = right <= gutter_left
+        on_right = left >= gutter_right
+        n_left = int(on_left.sum())
+        n_right = int(on_right.sum())
+        if n_left == 0 or n_right == 0:
+            continue
+        width_score = min(1.0, (gutter_right-gutter_left)/(2*text_size))
+        support_score = min(1.0, min(n_left, n_right)/min_words)
+        side_by_side = _span_overlap(top[on_left], bottom[on_left], top[on_right], bottom[on_right])
+        confidence = width_score*support_score*side_by_side
+        if confidence >= min_confidence:
+            found.append(columnBoundary((gutter_left+gutter_right)//2, confidence, gutter_left, gutter_right))
+    return found
+
+def region_word_rows(geometry):
+
+    # Rows of the geometry word table grouped by the row of their region
+    line_regions = geometry.lines.parents
+    word_lines = geometry.words.parents
+    word_regions = np.where(word_lines >= 0, line_regions[np.maximum(word_lines, 0)], -1) if len(line_regions) > 0 else word_lines
+    order = np.argsort(word_regions, kind='stable')
+    sorted_regions = word_regions[order]
+    groups = {}
+    region_rows = np.unique(sorted_regions)
+    bounds = np.searchsorted(sorted_regions, region_rows, side='left').tolist() + [len(order)]
+    for i, row in enumerate(region_rows.tolist()):
+        if row >= 0:
+            groups[row] = order[bounds[i]:bounds[i+1]]
+    return groups
+
+def detect_page_columns(page, **kwargs):
+
+    # Gutters across every word on the page
+    return detect_columns(page.geometry.words.boxes, **kwargs)
+
+def detect_region_columns(page, **kwargs):
+
+    # {region id : [columnBoundary]} for the text regions of a page, from their own words
+    word_boxes = page.geometry.words.boxes
+    region_objects = page.geometry.regions.objects
+    found = {}
+    for row, word_rows in region_word_rows(page.geometry).items():
+        region = region_objects[row]
+        if region.region_type == 'text':
+            found[region.id] = detect_columns(word_boxes[word_rows], **kwargs)
+    return found
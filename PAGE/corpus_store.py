@@ -0,0 +1,289 @@
+from .read_corpus import iter_corpus
+from .read_page_xml import pageXML
+from .page_store import _pack_strings
+import numpy as np
+import json
+import os
+
+# Columnar store for a whole corpus of pages. Every column is one raw binary file in the store
+# directory and manifest.json records its dtype and shape, so the store is opened with
+# np.memmap and corpus-wide queries never touch the XML. Offsets columns have one more entry
+# than the rows they describe and index into the whole corpus; box columns follow BoxCoords
+# order (left, right, top, bottom) with a has_box mask for elements without coordinates.
+
+STORE_VERSION = 1
+MANIFEST = 'manifest.json'
+LEVELS = ('page', 'region', 'line', 'word')
+STRING_COLUMNS = ('page_file', 'image_file', 'region_id', 'region_type', 'line_id', 'line_text', 'word_id', 'word_text')
+
+# Columns holding row numbers at another level, shifted by that level's running count on append
+ROW_COLUMNS = {'page_region_offsets' : 'region', 'page_line_offsets' : 'line', 'page_word_offsets' : 'word',
+               'region_line_offsets' : 'line', 'line_word_offsets' : 'word',
+               'region_page' : 'page', 'line_region' : 'region', 'word_line' : 'line'}
+
+def _box_columns(coords_list):
+
+    boxes = [None if c is None else c.box for c in coords_list]
+    has_box = np.array([b is not None for b in boxes], dtype=bool)
+    box_array = np.array([b if b is not None else (0, 0, 0, 0) for b in boxes], dtype=np.int32).reshape(-1, 4)
+    return (box_array, has_box)
+
+def page_columns(page):
+
+    # Columns for a single page, with offsets and parent rows local to the page. Module level
+    # so it can be used as an iter_corpus callback
+    regions = page.regions
+    lines = [ln for reg in regions for ln in reg.text_lines]
+    words = [wd for ln in lines for wd in ln.words]
+    line_counts = [reg.line_count for reg in regions]
+    word_counts = [len(ln.words) for ln in lines]
+
+    columns = {'page_region_offsets' : np.array([0, len(regions)], dtype=np.int64),
+               'page_line_offsets' : np.array([0, len(lines)], dtype=np.int64),
+               'page_word_offsets' : np.array([0, len(words)], dtype=np.int64),
+               'image_width' : np.array([-1 if page.image_width is None else page.image_width], dtype=np.int32),
+               'image_height' : np.array([-1 if page.image_height is None else page.image_height], dtype=np.int32),
+               'region_line_offsets' : np.cumsum([0] + line_counts, dtype=np.int64),
+               'line_word_offsets' : np.cumsum([0] + word_counts, dtype=np.int64),
+               'region_page' : np.zeros(len(regions), dtype=np.int32),
+               'line_region' : np.repeat(np.arange(len(regions), dtype=np.int32), line_counts),
+               'word_line' : np.repeat(np.arange(len(lines), dtype=np.int32), word_counts)}
+
+    for level, coords_list in [('region', [reg.coords for reg in regions]), ('line', [ln.coords for ln in lines]),
+                               ('baseline', [ln.baseline for ln in lines]), ('word', [wd.coords for wd in words])]:
+        columns[f"{level}_boxes"], columns[f"{level}_has_box"] = _box_columns(coords_list)
+
+    for name, values in [('page_file', [None if page.file_name is None else str(page.file_name)]), ('image_file', [page.image_file]),
+                         ('region_id', [reg.id for reg in regions]), ('region_type', [reg.region_type for reg in regions]),
+                         ('line_id', [ln.id for ln in lines]), ('line_text', [ln.text for ln in lines]),
+                         ('word_id', [wd.id for wd in words]), ('word_text', [wd.text for wd in words])]:
+        columns[name], columns[f"{name}_offsets"], columns[f"{name}_missing"] = _pack_strings(values)
+
+    return columns
+
+def _empty_columns():
+
+    # Columns of a page without regions, for the dtype and shape of every column
+    page = pageXML(None)
+    page._image_file = None
+    page._image_width = None
+    page._image_height = None
+    return page_columns(page)
+
+class corpusStoreWriter(object):
+
+    # Appends page columns to the column files as they arrive, so memory use does not grow
+    # with the corpus. The manifest is written by close(), and a store without one is incomplete
+
+    def __init__(self, store_dir):
+
+        os.makedirs(store_dir, exist_ok=True)
+        if os.path.isfile(os.path.join(store_dir, MANIFEST)):
+            os.remove(os.path.join(store_dir, MANIFEST))
+        self.store_dir = store_dir
+        self.files = {}
+        self.columns = {}
+        self.counts = dict([(level, 0) for level in LEVELS])
+        self.blob_sizes = dict([(name, 0) for name in STRING_COLUMNS])
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def _write(self, name, value):
+
+        if name not in self.files:
+            self.files[name] = open(os.path.join(self.store_dir, f"{name}.bin"), 'wb')
+            self.columns[name] = [value.dtype.str, list(value.shape[1:]), 0]
+            if name.endswith('_offsets'):
+                # Leading zero, written once for the whole corpus
+                self.files[name].write(np.zeros(1, dtype=value.dtype).tobytes())
+                self.columns[name][2] = 1
+        self.files[name].write(np.ascontiguousarray(value).tobytes())
+        self.columns[name][2] += len(value)
+
+    def add(self, columns):
+
+        for name, value in columns.items():
+            if name in ROW_COLUMNS:
+                value = value + self.counts[ROW_COLUMNS[name]]
+            elif name.endswith('_offsets') and name[:-len('_offsets')] in self.blob_sizes:
+                value = value + self.blob_sizes[name[:-len('_offsets')]]
+            if name.endswith('_offsets'):
+                value = value[1:]
+            self._write(name, value)
+
+        for name in STRING_COLUMNS:
+            self.blob_sizes[name] += len(columns[name])
+        self.counts['page'] += 1
+        self.counts['region'] += len(columns['region_id_missing'])
+        self.counts['line'] += len(columns['line_id_missing'])
+        self.counts['word'] += len(columns['word_id_missing'])
+
+    def add_page(self, page):
+
+        self.add(page_columns(page))
+
+    def close(self):
+
+        if self.files is None:
+            return
+        # Columns no page was written to (an empty corpus, or one where every page failed)
+        # are still created, with no rows
+        for name, value in _empty_columns().items():
+            if name not in self.files:
+                self._write(name, value[:0])
+        for f in self.files.values():
+            f.close()
+        self.files = None
+        with open(os.path.join(self.store_dir, MANIFEST), 'w') as f:
+            json.dump({'version' : STORE_VERSION, 'counts' : self.counts, 'columns' : self.columns}, f)
+
+def pages_to_corpus_store(pages, store_dir):
+
+    with corpusStoreWriter(store_dir) as writer:
+        for page in pages:
+            writer.add_page(page)
+    return corpusStore(store_dir)
+
+def write_corpus_store(paths, store_dir, workers=None, chunksize=16, cache=None):
+
+    # Pages are parsed and turned into columns in the corpus worker pool; only the writing is
+    # done here. Returns the opened store and the pageResults of the files that failed to load
+    failures = []
+    with corpusStoreWriter(store_dir) as writer:
+        for result in iter_corpus(paths, workers=workers, callback=page_columns, chunksize=chunksize, cache=cache):
+            if result.error is None:
+                writer.add(result.value)
+            else:
+                failures.append(result)
+    return (corpusStore(store_dir), failures)
+
+class corpusStore(object):
+
+    def __init__(self, store_dir):
+
+        manifest_file = os.path.join(store_dir, MANIFEST)
+        if not os.path.isfile(manifest_file):
+            raise ValueError(f"No corpus store manifest in {store_dir}")
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        if manifest['version'] != STORE_VERSION:
+            raise ValueError(f"Unsupported corpus store version {manifest['version']}")
+
+        self.store_dir = store_dir
+        self.counts = manifest['counts']
+        self.columns = {}
+        for name, (dtype, shape, length) in manifest['columns'].items():
+            shape = tuple([length] + shape)
+            if length == 0 or np.prod(shape) == 0:
+                self.columns[name] = np.empty(shape, dtype=np.dtype(dtype))
+            else:
+                self.columns[name] = np.memmap(os.path.join(store_dir, f"{name}.bin"), dtype=np.dtype(dtype), mode='r', shape=shape)
+
+    def __len__(self):
+
+        return self.counts['page']
+
+    def __getitem__(self, name):
+
+        return self.columns[name]
+
+    @property
+    def page_count(self):
+
+        return self.counts['page']
+
+    @property
+    def region_count(self):
+
+        return self.counts['region']
+
+    @property
+    def line_count(self):
+
+        return self.counts['line']
+
+    @property
+    def word_count(self):
+
+        return self.counts['word']
+
+    def boxes(self, level):
+
+        return self.columns[f"{level}_boxes"]
+
+    def has_box(self, level):
+
+        return self.columns[f"{level}_has_box"]
+
+    def widths(self, level):
+
+        boxes = self.boxes(level)
+        return boxes[:, 1] - boxes[:, 0]
+
+    def heights(self, level):
+
+        boxes = self.boxes(level)
+        return boxes[:, 3] - boxes[:, 2]
+
+    def counts_per_page(self, level):
+
+        return np.diff(self.columns[f"page_{level}_offsets"])
+
+    def page_of(self, level, rows):
+
+        # Page number of each row at the given level (baselines share the line rows)
+        level = 'line' if level == 'baseline' else level
+        return np.searchsorted(self.columns[f"page_{level}_offsets"], rows, side='right') - 1
+
+    def rows_where(self, mask, level=None):
+
+        # Rows where mask is true; when a level is given, rows without a box are left out
+        if level is not None:
+            mask = mask & self.has_box(level)
+        return np.flatnonzero(mask)
+
+    def pages_where(self, mask):
+
+        return np.flatnonzero(mask)
+
+    def get_string(self, name, row):
+
+        if self.columns[f"{name}_missing"][row]:
+            return None
+        offsets = self.columns[f"{name}_offsets"]
+        return self.columns[name][offsets[row]:offsets[row+1]].tobytes().decode('utf-8')
+
+    def get_strings(self, name, rows):
+
+        return [self.get_string(name, row) for row in rows]
+
+    def page_file(self, page):
+
+        return self.get_string('page_file', page)
+
+    def image_file(self, page):
+
+        return self.get_string('image_file', page)
+
+    def page_rows(self, level, page):
+
+        level = 'line' if level == 'baseline' else level
+        offsets = self.columns[f"page_{level}_offsets"]
+        return np.arange(offsets[page], offsets[page+1])
+
+if __name__ == '__main__':
+
+    import sys
+
+    store, failures = write_corpus_store(sys.argv[1:-1], sys.argv[-1])
+    print(store.page_count, "pages", store.region_count, "regions", store.line_count, "lines", store.word_count, "words")
+    narrow = store.rows_where(store.widths('line') < 100, 'line')
+    print(len(narrow), "lines narrower than 100 on", len(np.unique(store.page_of('line', narrow))), "pages")
+    for fail in failures:
+        print("Failed:", fail.file_name, fail.error)
@@ -0,0 +1,189 @@
+from DocQSR.QSR import QSRRectangle, BoxCoords
+from collections import namedtuple
+import numpy as np
+
+# Nearest neighbour above, below, left and right of every line or word on a page. A box j is
+# below box i when the two overlap horizontally and j starts lower down (top_j > top_i); the
+# nearest is the one starting highest. Above, left and right are defined the same way, so
+# overlapping line boxes still find each other and the gap is negative where they overlap.
+# Each direction is one sweep along its axis with an interval min tree over the other axis,
+# O(n log n) per page.
+
+DIRECTIONS = ('above', 'below', 'left', 'right')
+
+neighbourResult = namedtuple('neighbourResult', 'rows gaps')
+
+class intervalMinTree:
+
+    # Insert-only tree over compressed positions 0..size-1. Each inserted value covers a closed
+    # range; query returns the smallest value whose range meets the query range. cover holds
+    # values spanning a whole node, below the smallest value meeting anything under the node.
+
+    def __init__(self, size):
+
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+        self.cover = [None] * (2*self.size)
+        self.below = [None] * (2*self.size)
+
+    def _lower(self, current, value):
+
+        return value if current is None or value < current else current
+
+    def insert(self, low, high, value):
+
+        cover = self.cover
+        below = self.below
+        l = low + self.size
+        r = high + self.size + 1
+        while l < r:
+            if l & 1:
+                cover[l] = self._lower(cover[l], value)
+                below[l] = self._lower(below[l], value)
+                l += 1
+            if r & 1:
+                r -= 1
+                cover[r] = self._lower(cover[r], value)
+                below[r] = self._lower(below[r], value)
+            l >>= 1
+            r >>= 1
+        for leaf in (low + self.size, high + self.size):
+            node = leaf >> 1
+            while node > 0:
+                below[node] = self._lower(below[node], value)
+                node >>= 1
+
+    def query(self, low, high):
+
+        best = None
+        l = low + self.size
+        r = high + self.size + 1
+        while l < r:
+            if l & 1:
+                if self.below[l] is not None:
+                    best = self._lower(best, self.below[l])
+                l += 1
+            if r & 1:
+                r -= 1
+                if self.below[r] is not None:
+                    best = self._lower(best, self.below[r])
+            l >>= 1
+            r >>= 1
+        for leaf in (low + self.size, high + self.size):
+            node = leaf >> 1
+            while node > 0:
+                if self.cover[node] is not None:
+                    best = self._lower(best, self.cover[node])
+                node >>= 1
+        return best
+
+def _sweep(low, high, keys):
+
+    # For each box, the box with the smallest key greater than its own among those whose
+    # [low, high] ranges overlap it, or -1. Ties go to the lower row
+    n = len(keys)
+    positions, compressed = np.unique(np.concatenate([low, high]), return_inverse=True)
+    lows = compressed[:n].tolist()
+    highs = compressed[n:].tolist()
+    tree = intervalMinTree(len(positions))
+    result = np.full(n, -1, dtype=np.int64)
+
+    # Largest keys first, answering each box before any box with its own key is inserted
+    order = np.lexsort((np.arange(n), -keys))
+    key_list = keys.tolist()
+    order = order.tolist()
+    start = 0
+    while start < n:
+        end = start
+        while end < n and key_list[order[end]] == key_list[order[start]]:
+            end += 1
+        for row in order[start:end]:
+            found = tree.query(lows[row], highs[row])
+            if found is not None:
+                result[row] = found[1]
+        for row in order[start:end]:
+            tree.insert(lows[row], highs[row], (key_list[row], row))
+        start = end
+    return result
+
+def nearest_neighbours(boxes, directions=DIRECTIONS):
+
+    # {direction: neighbourResult(rows, gaps)} for (N,4) boxes in BoxCoords column order. rows
+    # is -1 and gaps NaN where there is no neighbour in that direction
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    left, right, top, bottom = boxes.T
+    results = {}
+    for direction in directions:
+        if direction == 'below':
+            rows = _sweep(left, right, top)
+        elif direction == 'above':
+            rows = _sweep(left, right, -bottom)
+        elif direction == 'right':
+            rows = _sweep(top, bottom, left)
+        elif direction == 'left':
+            rows = _sweep(top, bottom, -right)
+        else:
+            raise ValueError(f"Unknown direction: {direction}")
+
+        found = rows >= 0
+        other = boxes[rows[found]]
+        gaps = np.full(len(boxes), np.nan)
+        if direction == 'below':
+            gaps[found] = other[:, 2] - bottom[found]
+        elif direction == 'above':
+            gaps[found] = top[found] - other[:, 3]
+        elif direction == 'right':
+            gaps[found] = other[:, 0] - right[found]
+        else:
+            gaps[found] = left[found] - other[:, 1]
+        results[direction] = neighbourResult(rows, gaps)
+    return results
+
+class pageNeighbours:
+
+    def __init__(self, page, level='line', directions=DIRECTIONS):
+
+        table = page.geometry[level]
+        self.level = level
+        self.nodes = table.objects
+        self.boxes = table.boxes
+        self.results = nearest_neighbours(self.boxes, directions)
+
+    def __len__(self):
+
+        return len(self.nodes)
+
+    def __getitem__(self, direction):
+
+        return self.results[direction]
+
+    def neighbour(self, node, direction):
+
+        row = self.results[direction].rows[node]
+        return None if row < 0 else self.nodes[row]
+
+    def gap(self, node, direction):
+
+        gap = self.results[direction].gaps[node]
+        return None if np.isnan(gap) else gap.item()
+
+    def centre_distance(self, node, direction):
+
+        # Distance between the centres of the node and its neighbour, or None
+        row = self.results[direction].rows[node]
+        if row < 0:
+            return None
+        this = QSRRectangle(BoxCoords(*self.boxes[node].tolist()))
+        return this.get_centre_distance(QSRRectangle(BoxCoords(*self.boxes[row].tolist())))
+
+    def gaps(self, direction):
+
+        gaps = self.results[direction].gaps
+        return gaps[~np.isnan(gaps)]
+
+    def line_spacing(self):
+
+        # Median gap to the line below (negative where line boxes overlap)
+        gaps = self.gaps('below')
+        return float(np.median(gaps)) if len(gaps) > 0 else None
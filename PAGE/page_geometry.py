@@ -0,0 +1,156 @@
+from DocQSR.QSR import BoxCoords, QSRRectangle
+import numpy as np
+
+class geometryTable:
+
+    # Contiguous boxes for every element at one level of a page. Columns follow BoxCoords
+    # (left, right, top, bottom); parents holds the row of the enclosing element (-1 if none).
+
+    def __init__(self, boxes, parents, objects):
+
+        self.boxes = np.array(boxes, dtype=np.int32).reshape(-1, 4)
+        self.parents = np.array(parents, dtype=np.int32)
+        self.objects = objects
+
+    def __len__(self):
+
+        return len(self.objects)
+
+    @property
+    def left(self):
+
+        return self.boxes[:, 0]
+
+    @property
+    def right(self):
+
+        return self.boxes[:, 1]
+
+    @property
+    def top(self):
+
+        return self.boxes[:, 2]
+
+    @property
+    def bottom(self):
+
+        return self.boxes[:, 3]
+
+    @property
+    def ids(self):
+
+        return [x.id for x in self.objects]
+
+    def get_box(self, row):
+
+        return BoxCoords(*self.boxes[row].tolist())
+
+class rowRectangle(QSRRectangle):
+
+    # QSRRectangle over one row of a geometryTable. Setting a side also writes it to the row,
+    # and the rectangle is rebound rather than rebuilt when the page's tables are refreshed
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+
+        super().__init__(table.get_box(row))
+        self.table = table
+        self.row = row
+
+    def bind(self, table, row):
+
+        self.table = table
+        self.row = row
+
+    def set_left(self, value):
+
+        self._left = value
+        self.table.boxes[self.row, 0] = value
+
+    def set_right(self, value):
+
+        self._right = value
+        self.table.boxes[self.row, 1] = value
+
+    def set_top(self, value):
+
+        self._top = value
+        self.table.boxes[self.row, 2] = value
+
+    def set_bottom(self, value):
+
+        self._bottom = value
+        self.table.boxes[self.row, 3] = value
+
+class pageGeometry:
+
+    # Struct-of-arrays store for all region, line, baseline and word boxes on a page. The
+    # pageCoord of every element with a box is attached to its row, after which the element
+    # reads its geometry from here rather than holding its own rectangle.
+
+    levels = ('region', 'line', 'baseline', 'word')
+
+    def __init__(self, regions):
+
+        data = dict([(lvl, {'boxes' : [], 'parents' : [], 'objects' : [], 'coords' : []}) for lvl in self.levels])
+
+        def add(level, obj, coords, parent):
+            box = None if coords is None else coords.box
+            if box is None:
+                return -1
+            data[level]['boxes'].append(box)
+            data[level]['parents'].append(parent)
+            data[level]['objects'].append(obj)
+            data[level]['coords'].append(coords)
+            return len(data[level]['objects'])-1
+
+        for reg in regions:
+            reg_row = add('region', reg, reg.coords, -1)
+            for line in reg.text_lines:
+                line_row = add('line', line, line.coords, reg_row)
+                add('baseline', line, line.baseline, line_row)
+                for word in line.words:
+                    add('word', word, word.coords, line_row)
+
+        self.tables = {}
+        for level in self.levels:
+            table = geometryTable(data[level]['boxes'], data[level]['parents'], data[level]['objects'])
+            for row, coords in enumerate(data[level]['coords']):
+                coords.attach(table, row)
+            self.tables[level] = table
+
+    def __getitem__(self, level):
+
+        return self.tables[level]
+
+    @property
+    def regions(self):
+
+        return self.tables['region']
+
+    @property
+    def lines(self):
+
+        return self.tables['line']
+
+    @property
+    def baselines(self):
+
+        return self.tables['baseline']
+
+    @property
+    def words(self):
+
+        return self.tables['word']
+
+def column_of(left, right, boundaries):
+
+    # Column of each box for sorted x boundaries: the number of boundaries it lies to the right
+    # of, where a box straddling a boundary goes right if its midpoint is right of it
+    left = np.asarray(left)[:, None]
+    right = np.asarray(right)[:, None]
+    b = np.asarray(boundaries)[None, :]
+    mid = ((left+right)/2).astype(np.int64)
+    right_of = (right > b) & ((left >= b) | (mid > b))
+    return right_of.sum(axis=1)
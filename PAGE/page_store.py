@@ -0,0 +1,352 @@
+from .read_page_xml import pageXML, pageRegion, pageLine, pageWord, pageCoord
+from DocQSR.QSR import BoxCoords
+import numpy as np
+import hashlib
+import json
+import mmap
+import os
+
+# Compact binary form of a parsed pageXML: region/line/word structure, boxes, parsed points
+# and UTF-8 text held as flat arrays. A page file is a magic string, a JSON header giving
+# the dtype, shape and offset of each array, then the 64 byte aligned array data. Reading
+# maps the file and wraps the arrays around the mapping without copying them.
+
+PAGE_MAGIC = b'DQSRPAGE'
+ALIGN = 64
+
+def _pack_strings(strings):
+
+    encoded = [b'' if x is None else x.encode('utf-8') for x in strings]
+    offsets = np.zeros(len(encoded)+1, dtype=np.int64)
+    np.cumsum([len(x) for x in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    missing = np.array([x is None for x in strings], dtype=bool)
+    return (blob, offsets, missing)
+
+def _unpack_strings(blob, offsets, missing):
+
+    data = blob.tobytes()
+    offsets = offsets.tolist()
+    missing = missing.tolist()
+    return [None if missing[i] else data[offsets[i]:offsets[i+1]].decode('utf-8') for i in range(len(missing))]
+
+def _pack_coords(coords_list):
+
+    # Parsed points, concatenated, plus the box of each entry (has_box False where there is none)
+    points = [np.empty((0, 2), dtype=np.int32) if c is None or c.parsed is None else np.asarray(c.parsed, dtype=np.int32).reshape(-1, 2) for c in coords_list]
+    offsets = np.zeros(len(points)+1, dtype=np.int64)
+    np.cumsum([len(p) for p in points], out=offsets[1:])
+    boxes = [None if c is None else c.box for c in coords_list]
+    has_box = np.array([b is not None for b in boxes], dtype=bool)
+    box_array = np.array([b if b is not None else (0, 0, 0, 0) for b in boxes], dtype=np.int32).reshape(-1, 4)
+    all_points = np.concatenate(points) if len(points) > 0 else np.empty((0, 2), dtype=np.int32)
+    raw, raw_offsets, raw_missing = _pack_strings([None if c is None else c.raw for c in coords_list])
+    return {'points' : all_points, 'point_offsets' : offsets, 'boxes' : box_array, 'has_box' : has_box,
+            'raw' : raw, 'raw_offsets' : raw_offsets, 'raw_missing' : raw_missing}
+
+def _unpack_coords(arrays, prefix):
+
+    # Points are views onto the stored array, not copies
+    offsets = arrays[f"{prefix}_point_offsets"]
+    points = np.split(arrays[f"{prefix}_points"], offsets[1:-1]) if len(offsets) > 1 else []
+    has_box = arrays[f"{prefix}_has_box"].tolist()
+    boxes = [BoxCoords._make(b) if has_box[i] else None for i, b in enumerate(arrays[f"{prefix}_boxes"].tolist())]
+    raws = _unpack_strings(arrays[f"{prefix}_raw"], arrays[f"{prefix}_raw_offsets"], arrays[f"{prefix}_raw_missing"])
+
+    coords = []
+    for raw, parsed, box in zip(raws, points, boxes):
+        this_coord = pageCoord(None)
+        if raw is not None:
+            this_coord.raw = raw
+            this_coord.parsed = parsed
+            this_coord._box = box
+        coords.append(this_coord)
+    return coords
+
+def _shell_string(item):
+
+    # Unmodelled children and attributes of the source element, for the writer
+    shell = item.shell()
+    return None if shell is None else shell.decode('utf-8')
+
+def _shell_bytes(shell):
+
+    return None if shell is None else shell.encode('utf-8')
+
+def page_to_arrays(page):
+
+    regions = page.regions
+    lines = [ln for reg in regions for ln in reg.text_lines]
+    words = [wd for ln in lines for wd in ln.words]
+
+    arrays = {'region_line_offsets' : np.cumsum([0] + [reg.line_count for reg in regions], dtype=np.int64),
+              'line_word_offsets' : np.cumsum([0] + [len(ln.words) for ln in lines], dtype=np.int64)}
+    for prefix, values in [('region_id', [reg.id for reg in regions]), ('region_type', [reg.region_type for reg in regions]),
+                           ('line_id', [ln.id for ln in lines]), ('line_text', [ln.text for ln in lines]),
+                           ('word_id', [wd.id for wd in words]), ('word_text', [wd.text for wd in words]),
+                           ('region_attributes', [json.dumps(reg.attributes) for reg in regions]),
+                           ('line_attributes', [json.dumps(ln.attributes) for ln in lines]),
+                           ('word_attributes', [json.dumps(wd.attributes) for wd in words]),
+                           ('region_shell', [_shell_string(reg) for reg in regions]),
+                           ('line_shell', [_shell_string(ln) for ln in lines]),
+                           ('word_shell', [_shell_string(wd) for wd in words])]:
+        blob, offsets, missing = _pack_strings(values)
+        arrays[prefix] = blob
+        arrays[f"{prefix}_offsets"] = offsets
+        arrays[f"{prefix}_missing"] = missing
+    for prefix, coords_list in [('region', [reg.coords for reg in regions]), ('line', [ln.coords for ln in lines]),
+                                ('baseline', [ln.baseline for ln in lines]), ('word', [wd.coords for wd in words])]:
+        for k, v in _pack_coords(coords_list).items():
+            arrays[f"{prefix}_{k}"] = v
+
+    arrays['region_has_text_equiv'] = np.array([reg.has_text_equiv for reg in regions], dtype=bool)
+    arrays['region_split'] = np.array([reg._split for reg in regions], dtype=bool)
+
+    # Metadata and the other children of Page go in the header so the page can be written out again
+    metadata, shell = page.shell_bytes()
+    meta = {'file_name' : None if page.file_name is None else str(page.file_name),
+            'image_file' : page.image_file, 'image_width' : page.image_width, 'image_height' : page.image_height,
+            'metadata' : None if metadata is None else metadata.decode('utf-8'),
+            'page_shell' : None if shell is None else shell.decode('utf-8')}
+    return (arrays, meta)
+
+def page_from_arrays(arrays, meta):
+
+    region_ids = _unpack_strings(arrays['region_id'], arrays['region_id_offsets'], arrays['region_id_missing'])
+    region_types = _unpack_strings(arrays['region_type'], arrays['region_type_offsets'], arrays['region_type_missing'])
+    line_ids = _unpack_strings(arrays['line_id'], arrays['line_id_offsets'], arrays['line_id_missing'])
+    line_texts = _unpack_strings(arrays['line_text'], arrays['line_text_offsets'], arrays['line_text_missing'])
+    word_ids = _unpack_strings(arrays['word_id'], arrays['word_id_offsets'], arrays['word_id_missing'])
+    word_texts = _unpack_strings(arrays['word_text'], arrays['word_text_offsets'], arrays['word_text_missing'])
+    region_coords = _unpack_coords(arrays, 'region')
+    line_coords = _unpack_coords(arrays, 'line')
+    baselines = _unpack_coords(arrays, 'baseline')
+    word_coords = _unpack_coords(arrays, 'word')
+    region_attributes = _unpack_strings(arrays['region_attributes'], arrays['region_attributes_offsets'], arrays['region_attributes_missing'])
+    line_attributes = _unpack_strings(arrays['line_attributes'], arrays['line_attributes_offsets'], arrays['line_attributes_missing'])
+    word_attributes = _unpack_strings(arrays['word_attributes'], arrays['word_attributes_offsets'], arrays['word_attributes_missing'])
+    region_shells = _unpack_strings(arrays['region_shell'], arrays['region_shell_offsets'], arrays['region_shell_missing'])
+    line_shells = _unpack_strings(arrays['line_shell'], arrays['line_shell_offsets'], arrays['line_shell_missing'])
+    word_shells = _unpack_strings(arrays['word_shell'], arrays['word_shell_offsets'], arrays['word_shell_missing'])
+    has_text_equiv = arrays['region_has_text_equiv'].tolist()
+    region_split = arrays['region_split'].tolist()
+    region_line_offsets = arrays['region_line_offsets'].tolist()
+    line_word_offsets = arrays['line_word_offsets'].tolist()
+
+    page = pageXML(None)
+    page.file_name = meta['file_name']
+    page._image_file = meta['image_file']
+    page._image_width = meta['image_width']
+    page._image_height = meta['image_height']
+    page.set_shell_bytes(None if meta['metadata'] is None else meta['metadata'].encode('utf-8'),
+                         None if meta['page_shell'] is None else meta['page_shell'].encode('utf-8'))
+
+    regions = []
+    for r, reg_id in enumerate(region_ids):
+        lines = []
+        index = {}
+        for l in range(region_line_offsets[r], region_line_offsets[r+1]):
+            words = []
+            for w in range(line_word_offsets[l], line_word_offsets[l+1]):
+                words.append(pageWord({'id' : word_ids[w], 'Coords' : word_coords[w], 'text' : word_texts[w]}))
+                words[-1]._attributes = json.loads(word_attributes[w])
+                words[-1]._shell = _shell_bytes(word_shells[w])
+            index[line_ids[l]] = len(index)
+            lines.append(pageLine({'id' : line_ids[l], 'region_id' : reg_id, 'Coords' : line_coords[l], 'Baseline' : baselines[l],
+                                   'text' : line_texts[l], 'words' : words}))
+            lines[-1]._attributes = json.loads(line_attributes[l])
+            lines[-1]._shell = _shell_bytes(line_shells[l])
+        regions.append(pageRegion({'id' : reg_id, 'region_type' : region_types[r], 'Coords' : region_coords[r], 'lines' : lines, 'index' : index}))
+        regions[-1]._attributes = json.loads(region_attributes[r])
+        regions[-1]._has_text_equiv = has_text_equiv[r]
+        regions[-1]._split = region_split[r]
+        regions[-1]._shell = _shell_bytes(region_shells[r])
+
+    page.regions = regions
+    page.regions_index = dict([(reg.id, i) for i, reg in enumerate(regions)])
+    page._refresh_geometry()
+    return page
+
+def write_arrays(file_name, arrays, meta):
+
+    header = {'meta' : meta, 'arrays' : {}}
+    offset = 0
+    for name, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        header['arrays'][name] = [value.dtype.str, list(value.shape), offset]
+        offset += -(-value.nbytes // ALIGN) * ALIGN
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(PAGE_MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+    with open(file_name, 'wb') as f:
+        f.write(PAGE_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, value in arrays.items():
+            data = np.ascontiguousarray(value).tobytes()
+            f.write(data)
+            f.write(b'\0' * (-len(data) % ALIGN))
+
+def read_arrays(file_name):
+
+    with open(file_name, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Empty page store file {file_name}")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(PAGE_MAGIC)] != PAGE_MAGIC:
+        raise ValueError(f"Not a page store file {file_name}")
+    header_len = int.from_bytes(buffer[len(PAGE_MAGIC):len(PAGE_MAGIC)+8], 'little')
+    header_end = len(PAGE_MAGIC)+8+header_len
+    header = json.loads(buffer[len(PAGE_MAGIC)+8:header_end].decode('utf-8'))
+    data_start = -(-header_end // ALIGN) * ALIGN
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=data_start+offset).reshape(shape)
+    return (arrays, header['meta'])
+
+def save_page(page, file_name):
+
+    arrays, meta = page_to_arrays(page)
+    write_arrays(file_name, arrays, meta)
+
+def load_page(file_name):
+
+    arrays, meta = read_arrays(file_name)
+    return page_from_arrays(arrays, meta)
+
+class pageCache(object):
+
+    # Directory of page store files keyed on the source file. With key='stat' the key is the
+    # absolute path, modification time and size; with key='content' it is a hash of the bytes.
+    # Hits touch the cache file so eviction (oldest first) approximates least recently used.
+
+    suffix = '.dqp'
+
+    def __init__(self, cache_dir, max_bytes=None, key='stat'):
+
+        if key not in ('stat', 'content'):
+            raise ValueError(f"Unknown cache key {key}")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.key = key
+        self.hits = 0
+        self.misses = 0
+        # Running total of the cache size, from one scan of the directory, so a store only
+        # lists the directory again when the cap is passed. Each process keeps its own total
+        self._total_bytes = None
+        self._entry_count = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_key(self, xml_file):
+
+        if self.key == 'content':
+            h = hashlib.sha1()
+            with open(xml_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+            return h.hexdigest()
+        st = os.stat(xml_file)
+        return hashlib.sha1(f"{os.path.abspath(xml_file)}|{st.st_mtime_ns}|{st.st_size}".encode('utf-8')).hexdigest()
+
+    def cache_file(self, xml_file):
+
+        return os.path.join(self.cache_dir, self.cache_key(xml_file) + self.suffix)
+
+    def load(self, xml_file):
+
+        cache_file = self.cache_file(xml_file)
+        if os.path.isfile(cache_file):
+            try:
+                page = load_page(cache_file)
+            except (ValueError, KeyError, OSError):
+                # Truncated or from an older layout, parse again below
+                page = None
+            if page is not None:
+                self.hits += 1
+                os.utime(cache_file)
+                page.file_name = xml_file
+                return page
+
+        self.misses += 1
+        page = pageXML(xml_file)
+        if page.load_error is None:
+            self.store(page, cache_file)
+        return page
+
+    def store(self, page, cache_file):
+
+        # Write beside the final name and rename so readers never see a partial file
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            save_page(page, tmp_file)
+            size = os.path.getsize(tmp_file)
+            replaced = os.path.getsize(cache_file) if os.path.exists(cache_file) else None
+            os.replace(tmp_file, cache_file)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        if self.max_bytes is None:
+            return
+        if self._total_bytes is None:
+            self._count()
+        else:
+            self._total_bytes += size - (0 if replaced is None else replaced)
+            self._entry_count += 0 if replaced is not None else 1
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _count(self):
+
+        entries = self.entries()
+        self._total_bytes = sum([e[1] for e in entries])
+        self._entry_count = len(entries)
+        return entries
+
+    def entries(self):
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.suffix):
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, os.path.join(self.cache_dir, name)))
+        return sorted(entries)
+
+    def __len__(self):
+
+        if self._entry_count is None:
+            self._count()
+        return self._entry_count
+
+    def size(self):
+
+        return sum([e[1] for e in self.entries()])
+
+    def evict(self):
+
+        # Remove the least recently used files until the cache is back under 90% of the cap
+        entries = self._count()
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for mtime, size, file_name in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+            self._entry_count -= 1
+
+    def clear(self):
+
+        for mtime, size, file_name in self.entries():
+            os.remove(file_name)
+        self._total_bytes = 0
+        self._entry_count = 0
@@ -0,0 +1,154 @@
+from .read_page_xml import pageXML
+from .write_to_page import pageWriter
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+import logging
+import os
+
+pageSummary = namedtuple('pageSummary', 'file_name collection htr layout image_file image_width image_height region_count line_count word_count')
+pageResult = namedtuple('pageResult', 'file_name value error')
+corpusResult = namedtuple('corpusResult', 'pages failures')
+
+logger = logging.getLogger(__name__)
+
+def find_page_files(paths, pattern="*.xml"):
+
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(sorted(path.rglob(pattern)))
+        else:
+            files.append(path)
+    return files
+
+def corpus_path_parts(file_name):
+
+    # Outputs/<collection>/<HTR>/<LAYOUT>/page.xml, where collection may span several directories
+    parts = Path(file_name).parent.parts
+    htr = None
+    layout = None
+    collection = None
+    for i in range(len(parts)-1, -1, -1):
+        if layout is None and parts[i].startswith("LAYOUT-"):
+            layout = parts[i]
+        elif htr is None and parts[i].startswith("HTR-"):
+            htr = parts[i]
+            if "Outputs" in parts[:i]:
+                start = max([j for j in range(i) if parts[j] == "Outputs"]) + 1
+                collection = "/".join(parts[start:i])
+            elif i > 0:
+                collection = parts[i-1]
+            break
+    return (collection, htr, layout)
+
+def summarise_page(page):
+
+    collection, htr, layout = corpus_path_parts(page.file_name)
+    line_count = 0
+    word_count = 0
+    for reg in page.regions:
+        line_count += reg.line_count
+        for line in reg.text_lines:
+            word_count += len(line.words)
+
+    return pageSummary(file_name=str(page.file_name), collection=collection, htr=htr, layout=layout,
+                       image_file=page.image_file, image_width=page.image_width, image_height=page.image_height,
+                       region_count=page.region_count, line_count=line_count, word_count=word_count)
+
+def _load_page(file_name, callback=None, cache=None):
+
+    try:
+        page = pageXML(str(file_name)) if cache is None else cache.load(str(file_name))
+        if page.load_error is not None:
+            return pageResult(str(file_name), None, page.load_error)
+        if callback is None:
+            return pageResult(str(file_name), summarise_page(page), None)
+        return pageResult(str(file_name), callback(page), None)
+    except Exception as e:
+        return pageResult(str(file_name), None, f"{type(e).__name__}: {e}")
+
+def iter_corpus(paths, workers=None, callback=None, chunksize=16, cache=None):
+
+    # callback runs in the worker process, so it must be a picklable (module level) function
+    # and should return something small and picklable. cache is an optional pageCache.
+    # Workers only return results; failures and progress are logged here in the parent
+    files = find_page_files(paths)
+    for done, result in enumerate(_map_pool(partial(_load_page, callback=callback, cache=cache), [files], workers, chunksize), 1):
+        if result.error is not None:
+            logger.warning("Failed to load %s: %s", result.file_name, result.error)
+        if done % 1000 == 0 or done == len(files):
+            logger.info("Loaded %d of %d pages", done, len(files))
+        yield result
+
+def _map_pool(func, arg_lists, workers, chunksize):
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1 or len(arg_lists[0]) <= 1:
+        yield from map(func, *arg_lists)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(func, *arg_lists, chunksize=chunksize)
+
+def load_corpus(paths, workers=None, callback=None, chunksize=16, cache=None):
+
+    pages = []
+    failures = []
+    for result in iter_corpus(paths, workers=workers, callback=callback, chunksize=chunksize, cache=cache):
+        if result.error is None:
+            pages.append(result.value)
+        else:
+            failures.append(result)
+
+    return corpusResult(pages, failures)
+
+def _write_page(page, file_name):
+
+    try:
+        pageWriter(page).write_to_file(file_name)
+        return pageResult(str(file_name), str(file_name), None)
+    except Exception as e:
+        return pageResult(str(file_name), None, f"{type(e).__name__}: {e}")
+
+def write_pages(pages, file_names, workers=None, chunksize=4):
+
+    # Pages are pickled to the workers without their lxml trees (see pageXML.__getstate__).
+    # Returns a pageResult per page, with the output file name as the value
+    return list(_map_pool(_write_page, [pages, file_names], workers, chunksize))
+
+def _rewrite_page(in_file, out_file, edit=None):
+
+    try:
+        page = pageXML(str(in_file))
+        if page.load_error is not None:
+            return pageResult(str(in_file), None, page.load_error)
+        if edit is not None:
+            edit(page)
+        pageWriter(page).write_to_file(out_file)
+        return pageResult(str(in_file), str(out_file), None)
+    except Exception as e:
+        return pageResult(str(in_file), None, f"{type(e).__name__}: {e}")
+
+def rewrite_pages(in_files, out_files, edit=None, workers=None, chunksize=16):
+
+    # Read, edit and write each page inside a worker so no page crosses a process boundary.
+    # edit changes the page in place and, like iter_corpus callbacks, must be module level
+    return list(_map_pool(partial(_rewrite_page, edit=edit), [in_files, out_files], workers, chunksize))
+
+if __name__ == '__main__':
+
+    import sys
+
+    corpus = load_corpus(sys.argv[1:])
+    for pg in corpus.pages:
+        print(pg)
+    for fail in corpus.failures:
+        print("Failed:", fail.file_name, fail.error)
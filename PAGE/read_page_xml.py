@@ -2,9 +2,11 @@
 
 import xmltodict
 from DocQSR.QSR import QSRRectangle, BoxCoords
-from DocQSR.QSR.QSRRectangle import isnumeric, parse_coords, coords_to_box
+from DocQSR.QSR.QSRPolygon import split_polygon, split_bands
+from DocQSR.QSR.QSRRectangle import parse_points, parse_points_batch, points_to_box, box_to_points, boxes_to_box
 #from QSRRectangles import Rectangle, BoxCoords, parse_coords, coords_to_box
 import hashlib
+import logging
 import os
 import lxml.etree
 import copy
@@ -14,9 +16,19 @@ from collections import defaultdict
 import numpy as np
 from bisect import bisect_left
 from pathlib import PosixPath, Path
+from .page_geometry import pageGeometry, rowRectangle, column_of
+from .column_detection import detect_columns, region_word_rows
+from .reading_order import reading_order
+from .spatial_index import pageSpatialIndex
+from .write_to_page import pageWriter, element_shell
+
+logger = logging.getLogger(__name__)
 
 sign = lambda x: math.copysign(1, x) if x != 0 else 0
 
+# md5 gives the long standing hash values; blake2b64 is a fast 64 bit alternative
+BASELINE_HASHES = {'md5' : hashlib.md5, 'blake2b64' : lambda : hashlib.blake2b(digest_size=8)}
+
 def chartotype(text):
     outtext = []
     for t in text:
@@ -33,28 +45,80 @@ def chartotype(text):
 
 class LayoutStructure(object):
 
+    element = None
+    _xpath = None
+    # Copy of the source element without the parts the model holds, kept for the writer once
+    # the element handle is dropped; _children_tags are the child elements the model holds
+    _shell = None
+    _children_tags = ()
+
     v_overlap_comparator = lambda x, y : QSRAllenDegree.AllenOverlapDegree(x.top, x.bottom, 'V').get_relationship(QSRAllenDegree.AllenOverlapDegree(y.top, y.bottom, 'V'))
     h_overlap_comparator = lambda x, y : QSRAllenDegree.AllenOverlapDegree(x.left, x.right, 'H').get_relationship(QSRAllenDegree.AllenOverlapDegree(y.left, y.right, 'H'))
 
+    @property
+    def xpath(self):
+
+        # Resolved from the element handle on first use rather than at load time
+        if self._xpath is None and self.element is not None:
+            self._xpath = self.element.getroottree().getpath(self.element)
+        return self._xpath
+
+    @property
+    def attributes(self):
+
+        # Attributes of the source element, also kept when the element handle is dropped
+        if self.element is not None:
+            return dict(self.element.attrib)
+        return self._attributes
+
+    @property
+    def source(self):
+
+        # Element the writer copies unmodelled children from: the parsed element, or its shell
+        # (parsed from bytes on first use)
+        if self.element is not None:
+            return self.element
+        if isinstance(self._shell, bytes):
+            self._shell = lxml.etree.fromstring(self._shell)
+        return self._shell
+
+    def shell(self):
+
+        # The shell as bytes, None without a source element
+        if self.element is None and not isinstance(self._shell, lxml.etree._Element):
+            return self._shell
+        return lxml.etree.tostring(element_shell(self.source, self._children_tags))
+
+    def __getstate__(self):
+
+        # lxml elements cannot be pickled; keep what the writer needs from them
+        state = self.__dict__.copy()
+        if state.get('element') is not None:
+            state['_attributes'] = dict(state['element'].attrib)
+            state['_xpath'] = self.xpath
+        state['_shell'] = self.shell()
+        state['element'] = None
+        return state
+
     @property
     def top(self):
 
-        return self.coords.bbox.top
+        return self.coords.top
 
     @property
     def left(self):
 
-        return self.coords.bbox.left
+        return self.coords.left
 
     @property
     def right(self):
 
-        return self.coords.bbox.right
+        return self.coords.right
 
     @property
     def bottom(self):
 
-        return self.coords.bbox.bottom
+        return self.coords.bottom
 
     @property
     def length(self):
@@ -114,32 +178,139 @@ class LayoutStructure(object):
 
 class pageCoord:
 
+    # The box is kept as a BoxCoords tuple, or as a row of a pageGeometry table once the page
+    # is attached; the QSRRectangle in bbox is only built when first asked for. Coordinates built
+    # from arrays (splits, rectangles) only format their points string when raw is read
+
+    _box = None
+    _bbox = None
+    _table = None
+    _row = None
+    _raw = None
+
     def __init__(self, coord_data):
 
         if isinstance(coord_data, QSRRectangle):
             self.bbox = coord_data
-            self.raw = self.box_to_raw(self.bbox)
-            self.parsed = parse_coords(self.raw)
+            self.parsed = box_to_points(coord_data.bbox)
             return
         elif isinstance(coord_data, str):
             self.raw = coord_data #['@points']
-            if len(self.raw) == 0:
-                self.parsed = []
-                self.bbox = None
-                return
-            self.parsed = parse_coords(self.raw)
-            self.bbox = QSRRectangle(coords_to_box(self.parsed))
+            self.parsed = parse_points(self.raw)
+            self._box = points_to_box(self.parsed)
+            return
+        elif isinstance(coord_data, np.ndarray):
+            self.parsed = coord_data.reshape(-1, 2)
+            self._box = points_to_box(self.parsed)
             return
         elif isinstance(coord_data, pageCoord):
-            self.bbox = coord_data.bbox
+            self._box = coord_data._box
+            self._bbox = coord_data._bbox
+            self._table = coord_data._table
+            self._row = coord_data._row
             self.parsed = coord_data.parsed
-            self.raw = coord_data.raw
+            self._raw = coord_data._raw
             return
         self.parsed = None
-        self.bbox = None
-        self.raw = None
         return
 
+    @property
+    def raw(self):
+
+        if self._raw is None and self.parsed is not None:
+            self._raw = self.parsed_to_raw(self.parsed)
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+
+        self._raw = value
+
+    @property
+    def bbox(self):
+
+        # Attached coords hand out one rectangle over their table row, so changes made
+        # through it reach the table and it is the same object on every access
+        if self._table is not None:
+            if self._bbox is None:
+                self._bbox = rowRectangle(self._table, self._row)
+            return self._bbox
+        if self._bbox is None and self._box is not None:
+            self._bbox = QSRRectangle(self._box)
+        return self._bbox
+
+    @bbox.setter
+    def bbox(self, value):
+
+        self._bbox = value
+        self._box = None
+        self._table = None
+        self._row = None
+
+    @property
+    def box(self):
+
+        if self._table is not None:
+            return self._table.get_box(self._row)
+        if self._box is not None:
+            return self._box
+        if self._bbox is not None:
+            return self._bbox.bbox
+        return None
+
+    def attach(self, table, row):
+
+        self._table = table
+        self._row = row
+        self._box = None
+        if isinstance(self._bbox, rowRectangle):
+            self._bbox.bind(table, row)
+        else:
+            self._bbox = None
+
+    @property
+    def left(self):
+
+        if self._table is not None:
+            return self._table.boxes.item(self._row, 0)
+        return self.box.left
+
+    @property
+    def right(self):
+
+        if self._table is not None:
+            return self._table.boxes.item(self._row, 1)
+        return self.box.right
+
+    @property
+    def top(self):
+
+        if self._table is not None:
+            return self._table.boxes.item(self._row, 2)
+        return self.box.top
+
+    @property
+    def bottom(self):
+
+        if self._table is not None:
+            return self._table.boxes.item(self._row, 3)
+        return self.box.bottom
+
+    @staticmethod
+    def raw_to_coords(raw_list):
+
+        # Batch equivalent of [pageCoord(r) for r in raw_list] using a single parse
+        parsed, boxes = parse_points_batch(raw_list)
+        coords = []
+        for raw, points, box in zip(raw_list, parsed, boxes):
+            this_coord = pageCoord(None)
+            if raw is not None:
+                this_coord.raw = raw
+                this_coord.parsed = points
+                this_coord._box = box
+            coords.append(this_coord)
+        return coords
+
     @staticmethod
     def box_to_raw(box):
 
@@ -148,7 +319,7 @@ class pageCoord:
     @staticmethod
     def parsed_to_raw(parsed):
 
-        return " ".join([",".join([str(x[0]), str(x[1])]) for x in parsed])
+        return " ".join([f"{x},{y}" for x, y in np.asarray(parsed).reshape(-1, 2).tolist()])
 
     @staticmethod
     def parsed_to_box(parsed):
@@ -156,12 +327,7 @@ class pageCoord:
         if parsed is None:
             return None
 
-        left = min([x[0] for x in parsed])
-        right = max([x[0] for x in parsed])
-        top = min([x[1] for x in parsed])
-        bottom = max([x[1] for x in parsed])
-
-        return QSRRectangle(BoxCoords(left=left, right=right, top=top, bottom=bottom))
+        return QSRRectangle(points_to_box(np.asarray(parsed)))
 
     @staticmethod
     def raw_to_box(raw):
@@ -173,57 +339,25 @@ class pageCoord:
 
         if len(raw) == 0:
             return None
-        coord_parts = [[int(float(y)) for y in x.split(",") if isnumeric(y)] for x in raw.split(" ")]
+        return parse_points(raw)
 
     @staticmethod
-    def split_horizontal(coords, x_pos):
-
-        # Assumes that raw coordinates go in a loop anti-clockwise from bottom left
-        left_side = [x for x in coords.parsed if x[0] < x_pos]
-        if len(left_side) == 0:
-            return {'left' : None, 'right' : coords.raw}
-        if len(left_side) == len(coords.parsed):
-            return {'left' : coords.raw, 'right' : None}
-
-        split_coords = {'left' : [], 'right' : []}
-        current_direction = 1
-        for i in range(len(coords.parsed)-1):
-            this_point = coords.parsed[i]
-            next_point = coords.parsed[i+1]
-            this_x, this_y = this_point
-            next_x, next_y = next_point
-            x_dist = next_x-this_x
-            direction = sign(x_dist)
-            if this_x < x_pos:
-                split_coords['left'].append(this_point)
-            if this_x > x_pos:
-                split_coords['right'].append(this_point)
-            if min(this_x, next_x) <= x_pos <= max(this_x, next_x):
-                mean_y = int((this_y+next_y)/2)
-                split_coords['left'].append([x_pos, mean_y])
-                split_coords['right'].append([x_pos, mean_y])
-        this_x, this_y = next_point
-        if this_x < x_pos:
-            split_coords['left'].append(next_point)
-        if this_x > x_pos:
-            split_coords['right'].append(next_point)
+    def split_horizontal(coords, x_pos, closed=True):
 
-
-        return_val = {'left' : None, 'right' : None}
-        if len(split_coords['left']) > 0:
-            return_val['left'] = pageCoord.parsed_to_raw(split_coords['left'])
-        if len(split_coords['right']) > 0:
-            return_val['right'] = pageCoord.parsed_to_raw(split_coords['right'])
-        #print("start:", coords.raw, "left:", pageCoord.parsed_to_raw(split_coords['left']))
-        return return_val
+        # Point arrays either side of x=x_pos (None for an empty side); closed=False for baselines
+        if coords.parsed is None:
+            return {'left' : None, 'right' : None}
+        left, right = split_polygon(np.asarray(coords.parsed), x_pos, axis=0, closed=closed)
+        return {'left' : left, 'right' : right}
 
 class pageWord(LayoutStructure):
 
     def __init__(self, word_data):
 
+        self._attributes = {}
         if isinstance(word_data, dict):
             self.id = word_data['id']
-            #self.xpath = word_data['xpath']
+            self.element = word_data.get('element')
             self.coords = pageCoord(word_data['Coords'])
             self.text = word_data['text']
             #if 'TextEquiv' in word_data and 'Unicode' in word_data['TextEquiv']:
@@ -251,10 +385,15 @@ class pageWord(LayoutStructure):
 
 class pageLine(LayoutStructure):
 
+    # Region holding the line, set when the region's text_lines are assigned
+    _region = None
+    _children_tags = ('Word',)
+
     def __init__(self, line_data):
 
+        self._attributes = {}
         self.id = line_data['id']
-        #self.xpath = line_data['xpath']
+        self.element = line_data.get('element')
         self.region_id = line_data['region_id']
         self.coords = pageCoord(line_data['Coords'])
         self.baseline = pageCoord(line_data['Baseline'])
@@ -273,9 +412,37 @@ class pageLine(LayoutStructure):
 
         return hashlib.md5((self.id, self.coords))
 
-    def get_baseline_hash(self):
+    @property
+    def baseline(self):
+
+        return self._baseline
 
-        return hashlib.md5((self.id, self.baseline))
+    @baseline.setter
+    def baseline(self, value):
+
+        self._baseline = value
+        self._baseline_hashes = {}
+        if self._region is not None:
+            # The region digest (and so the page digest) covers this baseline too
+            self._region.invalidate()
+
+    def get_baseline_hash(self, algorithm='md5'):
+
+        # Hash of the raw baseline points, cached until the baseline is replaced. Callers get
+        # a copy, so updating it leaves the cache alone
+        if algorithm not in self._baseline_hashes:
+            this_hash = BASELINE_HASHES[algorithm]()
+            if self.baseline is not None and self.baseline.raw is not None:
+                this_hash.update(self.baseline.raw.encode('utf-8'))
+            self._baseline_hashes[algorithm] = this_hash
+        return self._baseline_hashes[algorithm].copy()
+
+    def __getstate__(self):
+
+        # hashlib objects cannot be pickled
+        state = super().__getstate__()
+        state['_baseline_hashes'] = {}
+        return state
 
     def __iter__(self):
 
@@ -313,12 +480,13 @@ class pageLine(LayoutStructure):
     def split_horizontal(self, x_pos):
 
         if len(self.words) == 0:
+            # A line without words moves whole to the side its right edge falls on
+            whole = pageLine({'id' : self.id, 'element' : self.element, 'region_id' : self.region_id, 'words' : self.words,
+                              'Baseline' : self.baseline, 'Coords' : self.coords, 'text' : self.text})
+            whole._shell = self._shell
             if self.coords.bbox.right <= x_pos:
-                return {'left' :  pageLine({'id' : self.id, 'region_id' : self.region_id, 'words' : self.words,  'Baseline' : self.baseline,  'Coords' : self.coords, 'text' : self.text}),
-                        'right' : None}
-            else:
-                return {'left' : None,
-                        'right' :  pageLine({'id' : self.id, 'region_id' : self.region_id, 'words' : self.words,  'Baseline' : self.baseline,  'Coords' : self.coords, 'text' : self.text})}
+                return {'left' : whole, 'right' : None}
+            return {'left' : None, 'right' : whole}
 
         left_word_list = []
         right_word_list = []
@@ -344,29 +512,74 @@ class pageLine(LayoutStructure):
             cut_at = max([w.right for w in word_list['left']])+1
 
         split_coords = self.coords.split_horizontal(self.coords, cut_at)
-        split_baseline = self.baseline.split_horizontal(self.coords, cut_at)
+        split_baseline = self.baseline.split_horizontal(self.baseline, cut_at, closed=False)
         left_text = " ".join([wd.text for wd in word_list['left']])
         right_text = " ".join([wd.text for wd in word_list['right']])
 
         #print(self.id, "Before:", self.coords.bbox, self.text, "After left:", split_coords['left'], left_text, "After Right:", split_coords['right'], right_text)
+        side_ids = {'left' : self.id, 'right' : self.id}
+        if len(word_list['left']) > 0 and len(word_list['right']) > 0:
+            side_ids['right'] = f"{self.id}_s1"
         for side in ['left', 'right']:
             side_words = word_list[side]
             if len(side_words) > 0:
-                return_val[side] = pageLine({'id' : self.id, 'region_id' : self.region_id, 'words' : side_words,
-                                             'Baseline' : split_baseline[side], 'Coords' : split_coords[side], 'text' : " ".join([wd.text for wd in side_words])})
+                return_val[side] = pageLine({'id' : side_ids[side], 'element' : self.element, 'region_id' : self.region_id, 'words' : side_words,
+                                             'Baseline' : split_baseline[side], 'Coords' : split_coords[side],
+                                             'text' : " ".join([wd.text for wd in side_words])})
+                return_val[side]._shell = self._shell
 
             #for wd in side_words:
             #    print(f"\t{side[0].upper()}:", wd.text, "L:", wd.left, "R:", wd.right, "M:", wd.mid_horizontal, "X:", x_pos, "C:", cut_at)
 
         return return_val
 
+    def split_columns(self, word_columns, boundaries, columns=None):
+
+        # Multi-column form of split_horizontal, equivalent to splitting at each boundary in turn.
+        # word_columns holds the column of each word and columns the sorted columns being split
+        # apart (by default the line's own). The cut between two of those is one pixel right of
+        # the last word in the left column, or at its boundary if the line has no words there
+        if len(self.words) == 0:
+            return {bisect_left(boundaries, self.coords.bbox.right) : self}
+
+        column_words = defaultdict(list)
+        for wd, col in zip(self.words, word_columns):
+            column_words[col].append(wd)
+        if columns is None:
+            columns = sorted(column_words)
+        cuts = [max([w.right for w in column_words[k]])+1 if k in column_words else boundaries[k] for k in columns[:-1]]
+
+        coords_pieces = [None]*len(columns) if self.coords.parsed is None else split_bands(np.asarray(self.coords.parsed), cuts)
+        baseline_pieces = [None]*len(columns) if self.baseline.parsed is None else split_bands(np.asarray(self.baseline.parsed), cuts, closed=False)
+
+        return_val = {}
+        for i, col in enumerate(sorted(column_words)):
+            pos = columns.index(col)
+            side_words = column_words[col]
+            side_coords = coords_pieces[pos]
+            if side_coords is None:
+                # Words reaching outside the line polygon; fall back to the box around them
+                side_coords = QSRRectangle(boxes_to_box([w.coords.box for w in side_words]))
+            side_baseline = baseline_pieces[pos]
+            return_val[col] = pageLine({'id' : self.id if i == 0 else f"{self.id}_s{i}", 'element' : self.element, 'region_id' : self.region_id,
+                                        'words' : side_words, 'Baseline' : side_baseline, 'Coords' : side_coords,
+                                        'text' : " ".join([wd.text for wd in side_words])})
+            return_val[col]._shell = self._shell
+        return return_val
+
 
 class pageRegion(LayoutStructure):
 
+    _has_text_equiv = False
+    # Set on the pieces of a split region, whose text is rebuilt from their lines
+    _split = False
+    _children_tags = ('TextLine',)
+
     def __init__(self, region_data, vertical_sort=True):
 
+        self._attributes = {}
         self.id = region_data['id']
-        #self.xpath = region_data['xpath']
+        self.element = region_data.get('element')
         self.coords = pageCoord(region_data['Coords'])
         self.text_lines = region_data['lines']
         self.line_index = region_data['index']
@@ -388,8 +601,40 @@ class pageRegion(LayoutStructure):
                 self.text_lines.sort(key=lambda x : x.coords.bbox.bottom)
             self.line_index = dict([(p.id, i) for i,p in enumerate(self.text_lines)])
         '''
-        self.vertical_ordering = sorted(self.text_lines, key=lambda x : x.coords.bbox.bottom)
 
+    @property
+    def text_lines(self):
+
+        return self._text_lines
+
+    @text_lines.setter
+    def text_lines(self, lines):
+
+        self._text_lines = lines
+        for ln in lines:
+            ln._region = self
+        self.invalidate()
+
+    @property
+    def has_text_equiv(self):
+
+        if self.element is not None:
+            return self.element.find(f"{pageReader.xmlns}TextEquiv") is not None
+        return self._has_text_equiv
+
+    def __getstate__(self):
+
+        state = super().__getstate__()
+        state['_has_text_equiv'] = self.has_text_equiv
+        state['_baseline_hashes'] = {}
+        return state
+
+    def invalidate(self):
+
+        # Call after changing text_lines in place or editing a line's geometry
+        self._reading_order = None
+        self._vertical_ordering = None
+        self._baseline_hashes = {}
 
     def split_horizontal(self, x_pos):
 
@@ -412,36 +657,105 @@ class pageRegion(LayoutStructure):
                 #for l in side_lines:
                     #if l.coords.bbox is None:
                     #    print(l, l.coords.raw, l.coords.parsed, l.coords.bbox, self.get_line_by_name(l.id))
-                top = min([l.top for l in side_lines])
-                left = min([l.left for l in side_lines])
-                bottom = max([l.bottom for l in side_lines])
-                right = max([l.right for l in side_lines])
-
-                return_val[side] = pageRegion({'id' : self.id, 'lines' : lines[side],
-                                               'Coords' : QSRRectangle(BoxCoords(top=top, bottom=bottom, left=left, right=right)), 'index' : self.line_index}) # last entry needs changing
+                return_val[side] = pageRegion({'id' : self.id, 'region_type' : self.region_type, 'element' : self.element, 'lines' : lines[side],
+                                               'Coords' : QSRRectangle(boxes_to_box([l.coords.box for l in side_lines])),
+                                               'index' : dict([(l.id, i) for i, l in enumerate(side_lines)])})
+                return_val[side]._shell = self._shell
+                return_val[side]._split = True
 
         return return_val
 
-    def get_line_by_bbox(self, bbox):
+    def split_columns(self, word_columns, boundaries):
 
-        split_above = bisect_left([x.bottom for x in self.vertical_ordering], bbox.top)
-        if split_above >= len(self.vertical_ordering):
-            print(bbox.top, split_above, len(self.vertical_ordering))
-            return None
-        this_line = self.vertical_ordering[split_above]
+        # Splits the region's lines across the columns; returns {column : pageRegion} for the
+        # columns that receive lines. word_columns maps id(word) to its column
+        line_columns = []
+        for line in self:
+            if len(line.words) == 0:
+                line_columns.append((line, None))
+            else:
+                line_columns.append((line, [word_columns.get(id(wd), 0) for wd in line.words]))
+        columns = set()
+        for line, cols in line_columns:
+            columns.update([bisect_left(boundaries, line.coords.bbox.right)] if cols is None else cols)
+        columns = sorted(columns)
+        if len(columns) < 2:
+            return {columns[0] : self} if len(columns) > 0 else {}
+
+        lines = defaultdict(list)
+        for line, cols in line_columns:
+            for col, piece in line.split_columns(cols, boundaries, columns).items():
+                lines[col].append(piece)
+
+        return_val = {}
+        for col in sorted(lines):
+            side_lines = lines[col]
+            return_val[col] = pageRegion({'id' : self.id, 'region_type' : self.region_type, 'element' : self.element, 'lines' : side_lines,
+                                          'Coords' : QSRRectangle(boxes_to_box([l.coords.box for l in side_lines])),
+                                          'index' : dict([(l.id, i) for i, l in enumerate(side_lines)])})
+            return_val[col]._shell = self._shell
+            return_val[col]._split = True
+        return return_val
+
+    @property
+    def vertical_ordering(self):
+
+        if self._vertical_ordering is None:
+            self._vertical_ordering = sorted(self.text_lines, key=lambda x : x.bottom)
+            self._vertical_tops = [x.top for x in self._vertical_ordering]
+            self._vertical_bottoms = [x.bottom for x in self._vertical_ordering]
+            self._vertical_bottom_array = np.array(self._vertical_bottoms)
+        return self._vertical_ordering
+
+    def _best_line_from(self, split_above, top, bottom):
+
+        # Scans up from the first line ending at or below top, stopping after the first line
+        # that starts at or below bottom; the largest vertical overlap wins
+        ordering = self.vertical_ordering
+        tops = self._vertical_tops
+        bottoms = self._vertical_bottoms
+        this_top = tops[split_above]
         best_overlap = 0
         best_line = None
-        while this_line.top < bbox.bottom and split_above < len(self.vertical_ordering):
-            this_line = self.vertical_ordering[split_above]
-            max_top = max(this_line.top, bbox.top)
-            min_bottom = min(this_line.bottom, bbox.bottom)
-            if min_bottom-max_top > best_overlap:
-                best_overlap = min_bottom-max_top
-                best_line = this_line
+        while this_top < bottom and split_above < len(ordering):
+            this_top = tops[split_above]
+            overlap = min(bottoms[split_above], bottom)-max(this_top, top)
+            if overlap > best_overlap:
+                best_overlap = overlap
+                best_line = ordering[split_above]
             split_above += 1
 
         return best_line
 
+    def get_line_by_bbox(self, bbox):
+
+        # None where the box is below every line or overlaps none, as in get_lines_by_bbox
+        ordering = self.vertical_ordering
+        split_above = bisect_left(self._vertical_bottoms, bbox.top)
+        if split_above >= len(ordering):
+            return None
+        return self._best_line_from(split_above, bbox.top, bbox.bottom)
+
+    def get_lines_by_bbox(self, bboxes):
+
+        # Batch get_line_by_bbox; bboxes may be rectangles, BoxCoords or an (N,4) array in
+        # BoxCoords column order. Boxes below every line give None.
+        if isinstance(bboxes, np.ndarray):
+            tops = bboxes[:, 2].tolist()
+            bottoms = bboxes[:, 3].tolist()
+        else:
+            tops = [b.top for b in bboxes]
+            bottoms = [b.bottom for b in bboxes]
+
+        ordering = self.vertical_ordering
+        starts = self._vertical_bottom_array.searchsorted(tops, side='left').tolist()
+        lines = []
+        for split_above, top, bottom in zip(starts, tops, bottoms):
+            if split_above >= len(ordering):
+                lines.append(None)
+            else:
+                lines.append(self._best_line_from(split_above, top, bottom))
+        return lines
 
     def get_line_by_name(self, line_name):
 
@@ -469,104 +783,253 @@ class pageRegion(LayoutStructure):
 
     def __iter__(self):
 
-        for line in sorted(self.text_lines):
-            yield line
+        # Reading order is cached until the region is changed
+        if self._reading_order is None:
+            self._reading_order = reading_order(self.text_lines)
+        yield from self._reading_order
 
     @property
     def width(self):
 
         return self.coords.bbox.right-self.coords.bbox.left
 
-    def get_region_baseline_hash(self):
+    def get_region_baseline_hash(self, algorithm='md5'):
+
+        # Cached per algorithm until the region is invalidated, and returned as a copy like the
+        # line hashes. md5 hashes the concatenated baseline strings to keep the values it has
+        # always given, which cannot be built from the line hashes; other algorithms combine the
+        # cached line digests.
+        if algorithm not in self._baseline_hashes:
+            lines = sorted(self.text_lines, key=lambda x : x.id)
+            this_hash = BASELINE_HASHES[algorithm]()
+            for ln in lines:
+                if algorithm == 'md5':
+                    if ln.baseline is not None and ln.baseline.raw is not None:
+                        this_hash.update(ln.baseline.raw.encode('utf-8'))
+                else:
+                    this_hash.update(ln.get_baseline_hash(algorithm).digest())
+            self._baseline_hashes[algorithm] = this_hash
+        return self._baseline_hashes[algorithm].copy()
 
-        lines = [(ln.id, ln.baseline.raw) for ln in self]
-        lines.sort(key=lambda x : x[0])
-        this_hash = hashlib.md5()
-        for ln in lines:
-            this_hash.update(ln[1].encode('utf-8'))
-        return this_hash
+class pageReader(object):
 
-class pageXML(LayoutStructure):
+    # Builds pageRegion/pageLine/pageWord objects from lxml elements; shared by the
+    # whole-document and streaming readers
 
-    def __init__(self, xml_file, interval_list = None):
+    xmlns = "{http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15}"
 
-        self.xmlns = "{http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15}"
+    def _element_handle(self, element):
 
+        # Streamed elements are freed after reading so only keep handles into a retained tree
+        if self.xml_original is None:
+            return None
+        return element
+
+    def _read_region(self, x):
+
+        if x.tag == f"{self.xmlns}TextRegion":
+            region_type = "text"
+        elif x.tag == f"{self.xmlns}ImageRegion":
+            region_type = "image"
+        else:
+            return None
+        reg_lines = []
+        reg_id = x.attrib['id']
+        reg_element = self._element_handle(x)
+        reg_coords = None
+        for y in x:
+            if y.tag == f"{self.xmlns}Coords":
+                reg_coords = y.attrib['points']
+            if y.tag == f"{self.xmlns}TextLine":
+                reg_lines.append(y)
+        line_data, line_index = self._read_lines(reg_lines)
+
+        # Parse every points string in the region in one pass
+        raw_coords = [reg_coords] + [l['Coords'] for l in line_data] + [l['Baseline'] for l in line_data] + \
+                     [w['Coords'] for l in line_data for w in l['words']]
+        parsed_coords = iter(pageCoord.raw_to_coords(raw_coords))
+        reg_coords = next(parsed_coords)
+        for l in line_data:
+            l['Coords'] = next(parsed_coords)
+        for l in line_data:
+            l['Baseline'] = next(parsed_coords)
+        for l in line_data:
+            l['words'] = [pageWord(w | {'Coords' : next(parsed_coords)}) for w in l['words']]
+
+        reg_lines = [pageLine(l | {'region_id' : reg_id}) for l in line_data]
+        return pageRegion({'id' : reg_id, 'region_type' : region_type, 'element' : reg_element, 'Coords' : reg_coords, 'lines' : reg_lines, 'index' : line_index})
+
+    def _read_lines(self, line_data):
+
+        lines = []
+        index = {}
+
+        for line in line_data:
+            line_id = line.attrib['id']
+            line_element = self._element_handle(line)
+            line_coords = None
+            line_baseline = None
+            line_words = []
+
+            text = ''
+            for x in line:
+                if x.tag == f"{self.xmlns}Coords":
+                    line_coords = x.attrib['points']
+                if x.tag == f"{self.xmlns}Baseline":
+                    line_baseline = x.attrib['points']
+                if x.tag == f"{self.xmlns}Word":
+                    word_coords, word_text = self._read_words(x)
+                    line_words.append({'id' : x.attrib['id'], 'element' : self._element_handle(x), 'Coords' : word_coords, 'text' : word_text})
+                if x.tag == f"{self.xmlns}TextEquiv" and text == '':
+                    for z in x:
+                        if z.tag == f"{self.xmlns}Unicode":
+                            text = z.text
+                    if text is None:
+                        text = ''
+
+            index[line_id] = len(index)
+            lines.append({'id' : line_id, 'element' : line_element, 'Coords' : line_coords, 'Baseline' : line_baseline, 'text' : text, 'words' : line_words})
+
+        return (lines, index)
+
+    def _read_words(self, word_data):
+
+        coords = None
+        text = None
+
+        for w in word_data:
+            if w.tag == f"{self.xmlns}Coords":
+                coords = w.attrib['points']
+            if w.tag == f"{self.xmlns}TextEquiv":
+                for z in w:
+                    if z.tag == f"{self.xmlns}Unicode":
+                        text = z.text
+
+        return (coords, text)
+
+class pageXML(LayoutStructure, pageReader):
+
+    _page_shell = None
+    _root_shell = None
+
+    def __init__(self, xml_file, interval_list = None):
+
+        self._attributes = {}
         self.xml_original = None
-        self.xml = None
+        self.xml_root = None
+        self._xml = None
+        self.metadata = None
+        self.page = None
         self.file_name = None
+        self.load_error = None
         self.regions = []
         self.regions_index = {}
+        self.geometry = None
+        self._spatial_index = None
         
         if xml_file is None:
             return
 
+        # Single lxml parse; the xmltodict view is only built if self.xml is asked for
         if os.path.isfile(xml_file):
             self.file_name = xml_file
             if os.path.getsize(xml_file) == 0:
-                print("Empty file", xml_file)
+                logger.debug("Empty file %s", xml_file)
+                self.load_error = "Empty file"
                 return
-            self.xml = xmltodict.parse(open(xml_file, 'rb'))
-            self.xml_original = lxml.etree.parse(open(xml_file,'rb'))
+            self.xml_original = lxml.etree.parse(str(xml_file))
         else:
             # Could be the text of the XML rather then file itself
-            self.xml = xmltodict.parse(xml_file)
-            self.xml_original = lxml.etree.parse(xml_file)
-
-        try:
-            self.page = self.xml['PcGts']['Page']
-            self.xml_root = self.xml_original.getroot()
-        except:
-            print("Not valid page xml")
-            return
+            if isinstance(xml_file, str):
+                xml_file = xml_file.encode('utf-8')
+            self.xml_original = lxml.etree.fromstring(xml_file).getroottree()
+
+        self.xml_root = self.xml_original.getroot()
 
-        self.metadata = None
-        self.page = None
         for x in self.xml_root:
             if x.tag == f"{self.xmlns}Metadata":
                 self.metadata = x
             if x.tag == f"{self.xmlns}Page":
                 self.page = x
         if self.page is None:
-            print("Not valid page xml")
+            logger.debug("Not valid page xml: %s", xml_file)
+            self.load_error = "Not valid page xml"
             return
 
         self._image_height = int(self.page.attrib['imageHeight'])
         self._image_width = int(self.page.attrib['imageWidth'])
         self._image_file = self.page.attrib['imageFilename']
         self.regions, self.regions_index = self._read_regions()
+        self._refresh_geometry()
 
-    def save_to_file(self, xml_file_name, overwrite=False):
+    def _refresh_geometry(self):
 
-        if os.path.isfile(xml_file_name) and not overwrite:
-            print("File exists, set overwrite=True to save")
-            return
+        # Called whenever regions are added, removed or split
+        self.geometry = pageGeometry(self.regions)
+        self._spatial_index = None
+
+    @property
+    def spatial_index(self):
 
-        et = lxml.etree.ElementTree(self.xml.root)
-        et.write(xml_file_name, pretty_print=True)
+        if self._spatial_index is None and self.geometry is not None:
+            self._spatial_index = pageSpatialIndex(self.geometry)
+        return self._spatial_index
 
-    def _split_coords(self, coords, x_pos):
+    @property
+    def xml(self):
+
+        if self._xml is None and self.xml_original is not None:
+            self._xml = xmltodict.parse(lxml.etree.tostring(self.xml_original))
+        return self._xml
+
+    def __getstate__(self):
+
+        # The lxml tree cannot be pickled. Metadata and a copy of Page without its regions are
+        # kept as bytes so the page can still be written out after unpickling
+        state = self.__dict__.copy()
+        for key in ['xml_original', 'xml_root', '_xml', 'page', 'metadata', '_spatial_index', '_root_shell']:
+            state[key] = None
+        state['metadata'], state['_page_shell'] = self.shell_bytes()
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self.set_shell_bytes(state.get('metadata'), state.get('_page_shell'))
+
+    def shell_bytes(self):
+
+        # Metadata, and a copy of PcGts holding Page without its regions, as bytes (None where missing)
+        metadata = None if self.metadata is None else lxml.etree.tostring(self.metadata)
+        shell = None
+        page_element = self.page if self.page is not None else self._page_shell
+        if page_element is not None:
+            root = self.xml_root if self.xml_root is not None else self._root_shell
+            page_shell = element_shell(page_element, ('TextRegion', 'ImageRegion'))
+            if root is None:
+                shell = page_shell
+            else:
+                shell = lxml.etree.Element(root.tag, root.attrib, nsmap=root.nsmap)
+                shell.append(page_shell)
+            shell = lxml.etree.tostring(shell)
+        return (metadata, shell)
 
-        left_side = [x for x in coords if x[0] < x_pos]
-        left_change = [sign(x[0]-left_side[i-1][0] if i > 0 else x[0]) for i, x in enumerate(left_side)]
-        left_turn = next(i for i,x in enumerate(left_change) if x < 1)
-        if left_side[left_turn-1][0] < x_pos:
-            left_side.insert(left_turn, [x_pos-1, left_side[left_turn-1][1]])
-            left_turn += 1
-        if left_side[left_turn][0] < x_pos:
-            left_side.insert(left_turn, [x_pos-1, left_side[left_turn][1]])
-            left_turn += 1
+    def set_shell_bytes(self, metadata, shell):
 
-        right_side = [x for x in coords if x[0] >= x_pos]
-        right_change = [sign(x[0]-right_side[i-1][0] if i > 0 else x[0]) for i, x in enumerate(right_side)]
-        right_turn = next(i for i,x in enumerate(right_change) if x < 1)
-        if right_side[0][0] != x_pos:
-            right_side.insert(0, [x_pos, right_side[0][1]])
-            right_turn += 1
-        if right_side[-1][0] != x_pos:
-            right_side.append([x_pos, right_side[-1][1]])
+        self.metadata = None if metadata is None else lxml.etree.fromstring(metadata)
+        self._root_shell = None
+        self._page_shell = None if shell is None else lxml.etree.fromstring(shell)
+        if self._page_shell is not None and self._page_shell.tag != f"{self.xmlns}Page":
+            self._root_shell = self._page_shell
+            self._page_shell = self._root_shell.find(f"{self.xmlns}Page")
 
-        return (left_side, right_side)
+    def save_to_file(self, xml_file_name, overwrite=False):
+
+        if os.path.isfile(xml_file_name) and not overwrite:
+            logger.warning("%s exists, set overwrite=True to save", xml_file_name)
+            return
+
+        pageWriter(self).write_to_file(xml_file_name)
 
     def split_region_vertically(self, region_id, y_pos):
 
@@ -575,11 +1038,7 @@ class pageXML(LayoutStructure):
         #print(xml_region)
         #parent = xml_region.getparent()
         #new_region = lxml.etree.SubElement(parent, xml_region.tag, xml_region.attrib)
-        new_region_id = len(self.regions)+1
-        for i in range(len(self.regions)):
-            if self.regions[i].id == f"tr_{new_region_id}":
-                new_region_id += 1
-        new_region_id = f"tr_{new_region_id}"
+        new_region_id = self._new_region_id()
 
         new_lines = []
         new_index = {}
@@ -590,15 +1049,28 @@ class pageXML(LayoutStructure):
                 del region.line_index[line.id]
         new_lines = [l for l in region.text_lines if l.id in new_index]
         old_lines = [l for l in region.text_lines if l.id in region.line_index]
-        old_index = [(l, i) for i,l in enumerate(old_lines)]
+        old_index = dict([(l.id, i) for i,l in enumerate(old_lines)])
         region.text_lines = old_lines
         region.line_index = old_index
         new_bbox = BoxCoords(top=y_pos+1, bottom=region.coords.bbox.bottom, left=region.coords.bbox.left, right=region.coords.bbox.right)
         old_bbox = BoxCoords(top=region.coords.bbox.top, bottom=y_pos, left=region.coords.bbox.left, right=region.coords.bbox.right)
         region.coords = pageCoord(QSRRectangle(old_bbox))
 
-        new_region = pageRegion({'id' : new_region_id, 'xpath' : None, 'Coords' : QSRRectangle(new_bbox), 'lines' : new_lines, 'index' : new_index})
+        for line in new_lines:
+            line.region_id = new_region_id
+        new_region = pageRegion({'id' : new_region_id, 'region_type' : region.region_type, 'element' : None, 'Coords' : QSRRectangle(new_bbox), 'lines' : new_lines, 'index' : new_index})
+        region._split = True
+        new_region._split = True
         self.regions.append(new_region)
+        self.regions_index[new_region_id] = len(self.regions)-1
+        self._refresh_geometry()
+
+    def _new_region_id(self):
+
+        new_region_id = len(self.regions)+1
+        while f"tr_{new_region_id}" in self.regions_index:
+            new_region_id += 1
+        return f"tr_{new_region_id}"
 
     def split_region_horizontal(self, region_id, x_pos):
 
@@ -606,9 +1078,66 @@ class pageXML(LayoutStructure):
         split = region.split_horizontal(x_pos)
         old_idx = self.regions_index[region_id]
         if split['left'] is not None and split['right'] is not None:
+            # The left piece keeps the region id, the right piece is a new region
+            split['right'].id = self._new_region_id()
+            for line in split['right'].text_lines:
+                line.region_id = split['right'].id
             self.regions[old_idx] = split['left']
             self.regions.append(split['right'])
-            self.regions_index[self.regions[-1].id] = len(self.regions_index)
+            self.regions_index[split['right'].id] = len(self.regions)-1
+            self._refresh_geometry()
+
+    def split_regions_by_columns(self, boundaries=None, region_ids=None, min_confidence=0.5):
+
+        # Splits every region crossed by the column boundaries in one pass. The column of every
+        # word is found once, with the rule split_horizontal applies at a single x position.
+        # Without boundaries each region is split at the gutters detected in its own words.
+        # Returns {original region id : [ids of the pieces]} for the regions split
+        word_table = self.geometry.words
+        if boundaries is None:
+            region_boundaries = {}
+            word_columns = {}
+            region_objects = self.geometry.regions.objects
+            for row, word_rows in region_word_rows(self.geometry).items():
+                region = region_objects[row]
+                if region.region_type != 'text' or (region_ids is not None and region.id not in region_ids):
+                    continue
+                found = [b.position for b in detect_columns(word_table.boxes[word_rows], min_confidence=min_confidence)]
+                if len(found) > 0:
+                    region_boundaries[region.id] = found
+                    cols = column_of(word_table.left[word_rows], word_table.right[word_rows], found).tolist()
+                    word_columns.update(zip([id(word_table.objects[r]) for r in word_rows.tolist()], cols))
+        else:
+            boundaries = sorted(boundaries)
+            if len(boundaries) == 0:
+                return {}
+            region_boundaries = dict([(reg.id, boundaries) for reg in self.regions])
+            word_columns = dict(zip([id(wd) for wd in word_table.objects], column_of(word_table.left, word_table.right, boundaries).tolist()))
+
+        split_ids = {}
+        for idx in range(len(self.regions)):
+            region = self.regions[idx]
+            if region.region_type != 'text' or region.id not in region_boundaries or (region_ids is not None and region.id not in region_ids):
+                continue
+            pieces = region.split_columns(word_columns, region_boundaries[region.id])
+            if len(pieces) > 1:
+                split_ids[region.id] = self._replace_region(idx, [pieces[col] for col in sorted(pieces)])
+
+        if len(split_ids) > 0:
+            self._refresh_geometry()
+        return split_ids
+
+    def _replace_region(self, idx, pieces):
+
+        # The leftmost piece keeps the region id, the others become new regions
+        self.regions[idx] = pieces[0]
+        for piece in pieces[1:]:
+            piece.id = self._new_region_id()
+            for line in piece.text_lines:
+                line.region_id = piece.id
+            self.regions.append(piece)
+            self.regions_index[piece.id] = len(self.regions)-1
+        return [piece.id for piece in pieces]
 
     def split_region_horizontally(self, region_id, x_pos):
 
@@ -648,69 +1177,38 @@ class pageXML(LayoutStructure):
         if len(chosen) == 0:
             return
 
-        new_region_lines = []
-        for line_id, words in chosen.items():
-            old_line = region.get_line_by_id(line_id)
-            
-        
-        #for line in chosen:
-        #    for word in line:
-
+        # Chosen words start the new region; the cut falls at the median left edge
+        word_columns = dict([(id(wd), 1) for words in chosen.values() for wd in words])
+        pieces = region.split_columns(word_columns, [int(median_left)])
+        if len(pieces) < 2:
+            return
+        new_ids = self._replace_region(self.regions_index[region_id], [pieces[col] for col in sorted(pieces)])
+        self._refresh_geometry()
+        return new_ids[1]
 
 
     def split_line_horizontally(self, region_id, line_id, x_pos):
 
-        #print(region_id, self.regions)
+        # Split one line at x_pos in place, as split_region_horizontal does for its lines.
+        # Returns the id of the new right hand line, or None if every word falls on one side
         reg = self.get_region_by_name(region_id)
+        if reg is None:
+            raise KeyError(f"No region {region_id}")
         line = reg.get_line_by_name(line_id)
-        xml_line = self.xml_root.xpath(line.xpath)[0]
-        new_line = lxml.etree.fromstring(lxml.etree.tostring(xml_line))
-
-        stay_set = set()
-        move_set = set()
-        new_x_pos = x_pos
-        for i, word in enumerate(line):
-            this_el = self.xml_root.xpath(word.xpath)
-            if word.right < x_pos:
-                stay_set.add(this_el[0])
-            else:
-                this_el = self.xml_root.xpath(word.xpath)
-                move_set.add(this_el[0])
-                new_x_pos = min(new_x_pos, word.left)
-
-        if len(move_set) == 0:
-            return
-
-        parent = xml_line.getparent()
-        new_line = lxml.etree.SubElement(parent, xml_line.tag, xml_line.attrib)
-        new_line.attrib['id'] += '_s1'
-        left_coords, right_coords = self._split_coords(line.coords.parsed, new_x_pos)
-        new_coords = lxml.etree.SubElement(new_line, f"{self.xmlns}Coords", points=" ".join([",".join(x) for x in right_coords]))
-        new_baseline = lxml.etree.SubElement(new_line, f"{self.xmlns}Baseline", points=line.baseline.raw)
-
-        for s in move_set:
-            new_line.append(s)
-
-
-        #print("")
-        #print("After")
-        #print(lxml.etree.tostring(xml_line, pretty_print=True))
-        #print("Duplicate")
-        #print(lxml.etree.tostring(new_line, pretty_print=True))
-        exit()
-        for m in move_set:
-            xml_line.remove(m)
-        new_line.attrib['id'] += '_s1'
+        if line is None:
+            raise KeyError(f"No line {line_id} in region {region_id}")
 
-        xml_line.getparent().append(new_line)
-        #print("")
-        #print("After")
-        #print(lxml.etree.tostring(xml_line, pretty_print=True))
-        #print("")
-        #print("New...")
-        #print(lxml.etree.tostring(new_line, pretty_print=True))
-        pass
+        split = line.split_horizontal(x_pos)
+        if split['left'] is None or split['right'] is None:
+            return None
+        if split['right'].id in reg.line_index:
+            raise ValueError(f"Line {split['right'].id} already exists in region {region_id}")
 
+        position = reg.line_index[line_id]
+        reg.text_lines = reg.text_lines[:position] + [split['left'], split['right']] + reg.text_lines[position+1:]
+        reg.line_index = dict([(ln.id, i) for i, ln in enumerate(reg.text_lines)])
+        self._refresh_geometry()
+        return split['right'].id
 
     @property
     def region_count(self):
@@ -757,13 +1255,12 @@ class pageXML(LayoutStructure):
         for pt in self._get_points('Coords'):
             yield pt
 
-    def get_baseline_hash(self):
+    def get_baseline_hash(self, algorithm='md5'):
 
-        this_hash = hashlib.md5()
-        regions = [r for r in self]
-        regions.sort(key=lambda x : x.id)
+        this_hash = BASELINE_HASHES[algorithm]()
+        regions = sorted(self.regions, key=lambda x : x.id)
         for reg in regions:
-            this_hash.update(reg.get_region_baseline_hash().hexdigest().encode('utf-8'))
+            this_hash.update(reg.get_region_baseline_hash(algorithm).hexdigest().encode('utf-8'))
 
         return this_hash.hexdigest()
 
@@ -785,124 +1282,64 @@ class pageXML(LayoutStructure):
         regions = []
         index = {}
         for x in self.page:
-            if x.tag == f"{self.xmlns}TextRegion":
-                region_type = "text"
-            elif x.tag == f"{self.xmlns}ImageRegion":
-                region_type = "image"
-            else:
+            this_reg = self._read_region(x)
+            if this_reg is None:
                 continue
-            reg_lines = []
-            reg_id = x.attrib['id']
-            reg_xpath = self.xml_original.getpath(x)
-            reg_coords = None
-            for y in x:
-                if y.tag == f"{self.xmlns}Coords":
-                    reg_coords = y.attrib['points']
-                if y.tag == f"{self.xmlns}TextLine":
-                    reg_lines.append(y)
-            line_data, line_index = self._read_lines(reg_lines)
-            reg_lines = [pageLine(l | {'region_id' : reg_id}) for l in line_data]
-            this_reg = pageRegion({'id' : reg_id, 'region_type' : region_type, 'xpath' : reg_xpath, 'Coords' : reg_coords, 'lines' : reg_lines, 'index' : line_index})
-            index[reg_id] = len(index)
-            regions.append(this_reg)
-
-        return (regions, index)
-
-        '''
-        if 'TextRegion' not in self.page:
-            return (regions, index)
-
-        text_region = self.page['TextRegion']
-        if isinstance(text_region, dict):
-            text_region = [text_region]
-
-        for reg in text_region:
-            this_reg = pageRegion(reg)
             index[this_reg.id] = len(index)
             regions.append(this_reg)
 
         return (regions, index)
-        '''
 
-    def _read_lines(self, line_data):
+    def _get_points(self, points_type):
 
-        lines = []
-        index = {}
+        if self.page is None:
+            yield from self._get_region_points(points_type)
+            return
 
-        for line in line_data:
-            line_id = line.attrib['id']
-            line_xpath = self.xml_original.getpath(line)
-            line_coords = None
-            line_baseline = None
-            line_words = []
+        text_regions = [x for x in self.page if x.tag == f"{self.xmlns}TextRegion"]
+        if len(text_regions) == 0:
+            logger.warning("No text region available in %s", self.file_name)
+            return
 
-            for x in line:
+        for reg in text_regions:
+            reg_id = reg.attrib['id']
+            for line in reg:
+                if line.tag != f"{self.xmlns}TextLine":
+                    continue
+                points = None
                 text = ''
-                if x.tag == f"{self.xmlns}Coords":
-                    line_coords = x.attrib['points']
-                if x.tag == f"{self.xmlns}Baseline":
-                    line_baseline = x.attrib['points']
-                if x.tag == f"{self.xmlns}Word":
-                    word_coords, word_text = self._read_words(x)
-                    w_xpath = self.xml_original.getpath(x)
-                    line_words.append(pageWord({'id' : x.attrib['id'], 'xpath' : w_xpath, 'Coords' : word_coords, 'text' : word_text}))
-                if x.tag == f"{self.xmlns}TextEquiv":
-                    for z in x:
-                        if z.tag == f"{self.xmlns}Unicode":
-                            text = z.text
+                for x in line:
+                    if x.tag == f"{self.xmlns}{points_type}":
+                        points = x.attrib.get('points')
+                    if x.tag == f"{self.xmlns}TextEquiv":
+                        for z in x:
+                            if z.tag == f"{self.xmlns}Unicode":
+                                text = z.text
+                if points is None:
+                    continue
                 if text is None:
                     text = ''
+                parsed = parse_points(points)
+                yield({'region_id' : reg_id, 'bounding_box' : points_to_box(parsed),
+                                             'coords' : parsed,
+                                             'raw' : points, 'id' : line.attrib['id'], 'text' : text})
 
-            index[line_id] = len(index)
-            lines.append({'id' : line_id, 'xpath' : line_xpath, 'Coords' : line_coords, 'Baseline' : line_baseline, 'text' : text, 'words' : line_words})
-
-        return (lines, index)
-
-    def _read_words(self, word_data):
+    def _get_region_points(self, points_type):
 
-        coords = None
-        text = None
-
-        for w in word_data:
-            if w.tag == f"{self.xmlns}Coords":
-                coords = w.attrib['points']
-            if w.tag == f"{self.xmlns}TextEquiv":
-                for z in w:
-                    if z.tag == f"{self.xmlns}Unicode":
-                        text = z.text
-
-        return (coords, text)
-
-    def _get_points(self, points_type):
-
-        page = self.xml['PcGts']['Page']
-        if 'TextRegion' not in page:
-            print("No text region available")
+        # Same records built from the regions, for pages rebuilt without their XML tree
+        text_regions = [reg for reg in self.regions if reg.region_type == "text"]
+        if len(text_regions) == 0:
+            logger.warning("No text region available in %s", self.file_name)
             return
 
-        text_region = page['TextRegion']
-        if isinstance(text_region, dict):
-            text_region = [text_region]
+        for reg in text_regions:
+            for line in reg.text_lines:
+                coords = line.coords if points_type == 'Coords' else line.baseline
+                if coords is None or coords.raw is None:
+                    continue
+                yield({'region_id' : reg.id, 'bounding_box' : coords.box, 'coords' : coords.parsed,
+                       'raw' : coords.raw, 'id' : line.id, 'text' : '' if line.text is None else line.text})
 
-        for reg in text_region:
-            if 'TextLine' not in reg:
-                continue
-            text_lines = reg['TextLine']
-            reg_id = reg['@id']
-
-            if isinstance(text_lines, dict):
-                text_lines = [text_lines]
-            for line in text_lines:
-                if points_type in line and isinstance(line[points_type], dict):
-                    if 'TextEquiv' in line and 'Unicode' in line['TextEquiv']:
-                        text = line['TextEquiv']['Unicode']
-                    else:
-                        text = ''
-                    if text is None:
-                        text = ''
-                    yield({'region_id' : reg_id, 'bounding_box' : parse_coords(line[points_type]['@points'], return_box=True),
-                                                 'coords' : parse_coords(line[points_type]['@points'], return_box=False),
-                                                 'raw' : line[points_type]['@points'], 'id' : line['@id'], 'text' : text})
 #        return
 #        for k,v in self.xml['PcGts']['Page'].items():
 #            if k == 'TextRegion':
@@ -926,17 +1363,79 @@ class pageXML(LayoutStructure):
 #                        print(ln)
 #                        yield(parse_coords(ln['Baseline']['@points']))
 
-if __name__ == '__main__':
+class pageXMLStream(pageReader):
 
-    from write_to_page import pageWriter
+    # Reads regions one at a time with lxml iterparse, releasing each TextRegion/ImageRegion
+    # once it has been converted so memory stays flat for very large files. Documents holding
+    # several Page elements (e.g. concatenated exports wrapped in one root) are read in turn.
+
+    def __init__(self, xml_file):
+
+        self.xml_original = None
+        self.file_name = xml_file
+        self.page_count = 0
+        self._image_height = None
+        self._image_width = None
+        self._image_file = None
+
+    @property
+    def image_file(self):
+
+        return self._image_file
+
+    @property
+    def image_height(self):
+
+        return self._image_height
+
+    @property
+    def image_width(self):
+
+        return self._image_width
+
+    def __iter__(self):
+
+        xml_file = self.file_name
+        if isinstance(xml_file, Path):
+            xml_file = str(xml_file)
+
+        page_tag = f"{self.xmlns}Page"
+        region_tags = (f"{self.xmlns}TextRegion", f"{self.xmlns}ImageRegion")
+        self.page_count = 0
+        region_count = 0
+        for event, el in lxml.etree.iterparse(xml_file, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                if el.tag == page_tag:
+                    self.page_count += 1
+                    self._image_height = int(el.attrib['imageHeight'])
+                    self._image_width = int(el.attrib['imageWidth'])
+                    self._image_file = el.attrib['imageFilename']
+                    region_count = 0
+                continue
+            if el.tag in region_tags:
+                if el.getparent().tag != page_tag:
+                    continue
+                reg = self._read_region(el)
+                reg.iterator_id = f"tr_{region_count}"
+                reg.page_number = self.page_count
+                region_count += 1
+                yield reg
+            elif el.tag != page_tag:
+                continue
+            # Drop the finished element and anything already processed before it
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+
+if __name__ == '__main__':
 
     PC = pageCoord(QSRRectangle(BoxCoords(left=10, right=50, top=20, bottom=40)))
     print('raw', PC.raw)
     print('parsed', PC.parsed)
     lr = PC.split_horizontal(PC, 30)
     print(lr)
-    print(PC.raw_to_box(lr['left']))
-    print(PC.raw_to_box(lr['right']))
+    print(PC.parsed_to_box(lr['left']))
+    print(PC.parsed_to_box(lr['right']))
 
     xml_file = '../Outputs/Metagrapho/1148/HTR-219785/LAYOUT-138805/7812a7da0eb50898fe3461904ef0b6d8.xml'
     xml_file = "../Outputs/Metagrapho/1148/HTR-123193/LAYOUT-138805/67a97b9fc1d8927688b282d344f713f0.xml"
@@ -944,9 +1443,6 @@ if __name__ == '__main__':
     xml_file = "../Outputs/Metagrapho/1148/HTR-218533/LAYOUT-138805/74550d2b93db6d0609e4cfe7495ed36a.xml"
 
     P = pageXML(xml_file)
-    #PW.write_to_file("./74550d2b93db6d0609e4cfe7495ed36a.xml")
-
-    #exit()
     for reg in P:
         print(reg)
     print("******")
@@ -956,34 +1452,3 @@ if __name__ == '__main__':
         print(reg)
     PW = pageWriter(P)
     PW.write_to_file("./74550d2b93db6d0609e4cfe7495ed36a.xml")
-    exit()
-    R = P.get_largest_region()
-    split = R.split_horizontal(1200)
-    print(split['left'])
-    print(split['right'])
-
-    exit()
-
-    for reg in P:
-        print(reg.id, reg)
-        #P.split_region_at(reg.id, 100)
-        for line in reg:
-            print("\t", line)
-            split = line.split_horizontal(700)
-            print(split)
-            exit()
-        print("")
-
-    #P.split_region_vertically('tr_2', 700)
-    P.split_region_horizontally('tr_2', 700)
-    exit()
-
-    for reg in P:
-        print(reg.id, reg)
-        #P.split_region_at(reg.id, 100)
-        for line in reg:
-            print("\t", line)
-        print("")
-
-
-
@@ -0,0 +1,80 @@
+# Reading order for pageLine/pageWord/pageRegion lists. Gives exactly the order of
+# sorted(structures) under LayoutStructure.__lt__/__gt__, but compares on plain lists of
+# edges with the overlap degrees worked out inline, instead of building AllenOverlapDegree
+# objects for every comparison.
+
+def _mostly_overlaps(x_start, x_end, y_start, y_end):
+
+    # AllenOverlapDegree(x).get_relationship(AllenOverlapDegree(y)) in ['mostly', 'equal', 'total']
+    xs = min(x_start, x_end)
+    xe = max(x_start, x_end)
+    ys = min(y_start, y_end)
+    ye = max(y_start, y_end)
+    if xs >= ye or xe <= ys:
+        return False
+    x_overlap = min(xe, ye) - max(xs, ys)
+    return x_overlap >= (xe-xs) / 2
+
+class _readingKey:
+
+    __slots__ = ('index', 'order')
+
+    def __init__(self, index, order):
+
+        self.index = index
+        self.order = order
+
+    def __lt__(self, other):
+
+        return self.order.is_before(self.index, other.index)
+
+class readingOrder:
+
+    def __init__(self, structures):
+
+        self.structures = list(structures)
+        self.top = [x.top for x in self.structures]
+        self.bottom = [x.bottom for x in self.structures]
+        self.left = [x.left for x in self.structures]
+        self.right = [x.right for x in self.structures]
+
+    def is_after(self, i, j):
+
+        # LayoutStructure.__gt__
+        top = self.top
+        bottom = self.bottom
+        left = self.left
+        right = self.right
+        if top[i] >= bottom[j]:
+            return True
+        if bottom[i] <= top[j]:
+            return False
+
+        if _mostly_overlaps(left[i], right[i], left[j], right[j]) or _mostly_overlaps(left[j], right[j], left[i], right[i]):
+            # Occupying the same horizontal space
+            return bottom[i] > bottom[j]
+
+        if _mostly_overlaps(top[i], bottom[i], top[j], bottom[j]) or _mostly_overlaps(top[j], bottom[j], top[i], bottom[i]):
+            return not left[i] < left[j]
+
+        return top[i] > top[j]
+
+    def is_before(self, i, j):
+
+        # LayoutStructure.__lt__, including its __eq__ (which compares right with bottom)
+        if self.top[i] == self.top[j] and self.bottom[i] == self.bottom[j] and self.left[i] == self.left[j] and self.right[i] == self.bottom[j]:
+            return False
+        return not self.is_after(i, j)
+
+    def sorted_indices(self):
+
+        keys = sorted([_readingKey(i, self) for i in range(len(self.structures))])
+        return [k.index for k in keys]
+
+    def sorted(self):
+
+        return [self.structures[i] for i in self.sorted_indices()]
+
+def reading_order(structures):
+
+    return readingOrder(structures).sorted()
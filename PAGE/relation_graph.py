@@ -0,0 +1,134 @@
+from DocQSR.QSR import AllenIntervals, rcc8_pairs, direction_pairs, allen_pairs, allen_description, RCC8_CODES, DIRECTION_CODES
+from .page_geometry import geometryTable
+from .spatial_index import gridIndex
+import numpy as np
+
+# Qualitative relation graph over the regions, lines or words of a page. Candidate pairs are
+# the boxes that come within max_gap of each other, found through a grid over the boxes grown
+# by half the gap, so the cost follows the number of neighbours rather than n squared. Edges
+# are directed and stored CSR style: the edges leaving node i are rows indptr[i]:indptr[i+1]
+# of indices (the other node) and of each relation array.
+
+RELATIONS = ('rcc8', 'direction', 'allen_h', 'allen_v')
+
+def candidate_pairs(boxes, max_gap, cell_size=None):
+
+    # Directed (i, j) pairs, i != j, whose boxes are no more than max_gap apart on both axes
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    if len(boxes) < 2:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    half = -(-int(max_gap) // 2)
+    grown = boxes + np.array([-half, half, -half, half])
+    grid = gridIndex(geometryTable(grown, np.full(len(boxes), -1), [None]*len(boxes)), cell_size)
+
+    # Every pair of boxes registered in the same cell
+    counts = np.diff(grid.offsets)
+    pair_counts = counts*counts
+    cell = np.repeat(np.arange(len(counts)), pair_counts)
+    local = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts)-pair_counts, pair_counts)
+    first = grid.rows[grid.offsets[cell] + local // counts[cell]]
+    second = grid.rows[grid.offsets[cell] + local % counts[cell]]
+    keys = np.unique(first[first != second]*len(boxes) + second[first != second])
+    src = keys // len(boxes)
+    dst = keys % len(boxes)
+
+    near = (boxes[src, 0] - boxes[dst, 1] <= max_gap) & (boxes[dst, 0] - boxes[src, 1] <= max_gap) & \
+           (boxes[src, 2] - boxes[dst, 3] <= max_gap) & (boxes[dst, 2] - boxes[src, 3] <= max_gap)
+    return (src[near], dst[near])
+
+class pageRelationGraph:
+
+    def __init__(self, page, level='line', max_gap=None, interval_class=AllenIntervals, relations=RELATIONS):
+
+        table = page.geometry[level]
+        self.level = level
+        self.nodes = table.objects
+        self.boxes = table.boxes
+        self.interval_class = interval_class
+        self.relations = tuple(relations)
+        if max_gap is None:
+            # Neighbouring lines or words, not the whole page
+            max_gap = int(np.median(self.boxes[:, 3]-self.boxes[:, 2])) if len(self.boxes) > 0 else 0
+        self.max_gap = max_gap
+
+        src, dst = candidate_pairs(self.boxes, max_gap)
+        order = np.lexsort((dst, src))
+        src = src[order]
+        dst = dst[order]
+        self.indices = dst
+        self.indptr = np.zeros(len(self.nodes)+1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(self.nodes)), out=self.indptr[1:])
+        self._src = src
+
+        a = self.boxes[src]
+        b = self.boxes[dst]
+        self.edge_data = {}
+        if 'rcc8' in self.relations:
+            self.edge_data['rcc8'] = rcc8_pairs(a, b)
+        if 'direction' in self.relations:
+            self.edge_data['direction'] = direction_pairs(a, b)
+        if 'allen_h' in self.relations:
+            self.edge_data['allen_h'] = allen_pairs(a[:, 0], a[:, 1], b[:, 0], b[:, 1], interval_class)
+        if 'allen_v' in self.relations:
+            self.edge_data['allen_v'] = allen_pairs(a[:, 2], a[:, 3], b[:, 2], b[:, 3], interval_class)
+
+    def __len__(self):
+
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+
+        return len(self.indices)
+
+    def __getitem__(self, relation):
+
+        return self.edge_data[relation]
+
+    def edge_rows(self, node):
+
+        return np.arange(self.indptr[node], self.indptr[node+1])
+
+    def neighbours(self, node):
+
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+
+    def edge(self, node, other):
+
+        # Row of the edge node -> other, or None if they are not neighbours
+        start, end = self.indptr[node], self.indptr[node+1]
+        pos = start + np.searchsorted(self.indices[start:end], other)
+        if pos < end and self.indices[pos] == other:
+            return int(pos)
+        return None
+
+    def relation(self, node, other, relation):
+
+        row = self.edge(node, other)
+        return None if row is None else self.edge_data[relation][row].item()
+
+    def edges(self):
+
+        return (self._src, self.indices)
+
+    def edges_where(self, relation, code):
+
+        # (source, target) node arrays of the edges with the given code
+        keep = self.edge_data[relation] == code
+        return (self._src[keep], self.indices[keep])
+
+    def describe(self, node, other):
+
+        row = self.edge(node, other)
+        if row is None:
+            return None
+        described = {}
+        for relation, values in self.edge_data.items():
+            value = values[row].item()
+            if relation == 'rcc8':
+                described[relation] = RCC8_CODES[value]
+            elif relation in ('allen_h', 'allen_v'):
+                described[relation] = allen_description(value, self.interval_class)
+            else:
+                described[relation] = DIRECTION_CODES[value]
+        return described
@@ -0,0 +1,187 @@
+from DocQSR.QSR import QSRRectangle, BoxCoords
+import numpy as np
+
+def _query_box(box):
+
+    if isinstance(box, QSRRectangle):
+        box = box.bbox
+    if isinstance(box, BoxCoords):
+        return (box.left, box.right, box.top, box.bottom)
+    return tuple(box)
+
+def box_gaps(boxes, left, right, top, bottom):
+
+    # Euclidean gap from each box to the query box, 0 where they touch or overlap
+    boxes = boxes.astype(np.int64)
+    dx = np.maximum(0, np.maximum(boxes[:, 0]-right, left-boxes[:, 1]))
+    dy = np.maximum(0, np.maximum(boxes[:, 2]-bottom, top-boxes[:, 3]))
+    return np.hypot(dx, dy)
+
+class gridIndex:
+
+    # Uniform grid over the boxes of one geometryTable. Each box is registered in every cell
+    # it touches; the cell lists are stored CSR style (sorted cell keys, offsets, rows).
+
+    def __init__(self, table, cell_size=None):
+
+        self.table = table
+        boxes = table.boxes.astype(np.int64)
+        if cell_size is None:
+            sizes = np.concatenate([boxes[:, 1]-boxes[:, 0], boxes[:, 3]-boxes[:, 2]])
+            cell_size = int(np.median(sizes)) if len(sizes) > 0 else 1
+        self.cell_size = max(1, cell_size)
+        if len(boxes) == 0:
+            self.keys = np.empty(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.rows = np.empty(0, dtype=np.int64)
+            return
+
+        self.origin_x = int(boxes[:, 0].min())
+        self.origin_y = int(boxes[:, 2].min())
+        cx0, cx1 = self._cells(boxes[:, 0], boxes[:, 1], self.origin_x)
+        cy0, cy1 = self._cells(boxes[:, 2], boxes[:, 3], self.origin_y)
+        self.columns = int(cx1.max())+1
+        self.grid_rows = int(cy1.max())+1
+
+        widths = cx1-cx0+1
+        counts = widths*(cy1-cy0+1)
+        box_rows = np.repeat(np.arange(len(boxes)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts)-counts, counts)
+        gx = cx0[box_rows] + local % widths[box_rows]
+        gy = cy0[box_rows] + local // widths[box_rows]
+        cell_keys = gy*self.columns + gx
+
+        order = np.argsort(cell_keys, kind='stable')
+        self.keys, starts = np.unique(cell_keys[order], return_index=True)
+        self.offsets = np.append(starts, len(order))
+        self.rows = box_rows[order]
+
+    def _cells(self, low, high, origin):
+
+        return ((np.asarray(low)-origin) // self.cell_size, (np.asarray(high)-origin) // self.cell_size)
+
+    def _rows_in(self, wanted):
+
+        # Rows registered in any of the wanted cell keys
+        found = np.searchsorted(self.keys, wanted)
+        present = found < len(self.keys)
+        found = found[present]
+        found = found[self.keys[found] == wanted[present]]
+        if len(found) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.rows[self.offsets[i]:self.offsets[i+1]] for i in found]))
+
+    def _block_keys(self, cx0, cx1, cy0, cy1):
+
+        cx0 = max(cx0, 0)
+        cx1 = min(cx1, self.columns-1)
+        cy0 = max(cy0, 0)
+        cy1 = min(cy1, self.grid_rows-1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.int64)
+        gx, gy = np.meshgrid(np.arange(cx0, cx1+1), np.arange(cy0, cy1+1))
+        return (gy*self.columns + gx).ravel()
+
+    def _ring_keys(self, cx0, cx1, cy0, cy1):
+
+        # Cells on the border of the block cx0..cx1, cy0..cy1 that lie inside the grid
+        keys = []
+        xs = np.arange(max(cx0, 0), min(cx1, self.columns-1)+1)
+        ys = np.arange(max(cy0+1, 0), min(cy1-1, self.grid_rows-1)+1)
+        for y in sorted(set([cy0, cy1])):
+            if 0 <= y < self.grid_rows:
+                keys.append(y*self.columns + xs)
+        for x in sorted(set([cx0, cx1])):
+            if 0 <= x < self.columns:
+                keys.append(ys*self.columns + x)
+        return np.concatenate(keys) if len(keys) > 0 else np.empty(0, dtype=np.int64)
+
+    def candidates(self, left, right, top, bottom):
+
+        if len(self.keys) == 0:
+            return self.rows
+        (cx0, cx1) = self._cells(left, right, self.origin_x)
+        (cy0, cy1) = self._cells(top, bottom, self.origin_y)
+        return self._rows_in(self._block_keys(int(cx0), int(cx1), int(cy0), int(cy1)))
+
+    def nearest(self, left, right, top, bottom, k=1):
+
+        # Rows of the k boxes with the smallest gap to the query box, ties by row. Cells are
+        # searched ring by ring outwards from those under the query; every box not yet seen
+        # lies outside the searched block, so the search stops once the k-th best gap is
+        # smaller than the gap to the block's edge
+        if len(self.keys) == 0 or k < 1:
+            return np.empty(0, dtype=np.int64)
+        boxes = self.table.boxes
+        cx0, cx1 = [int(c) for c in self._cells(left, right, self.origin_x)]
+        cy0, cy1 = [int(c) for c in self._cells(top, bottom, self.origin_y)]
+        k = min(k, len(boxes))
+
+        # Rings nearer than the grid hold no cells, so a query outside the grid starts at the
+        # first ring that reaches it
+        start = max(0, -cx1, cx0-(self.columns-1), -cy1, cy0-(self.grid_rows-1))
+        rows = np.empty(0, dtype=np.int64)
+        ring = start
+        while True:
+            bx0, bx1, by0, by1 = cx0-ring, cx1+ring, cy0-ring, cy1+ring
+            keys = self._block_keys(bx0, bx1, by0, by1) if ring == start else self._ring_keys(bx0, bx1, by0, by1)
+            if len(keys) > 0:
+                rows = np.union1d(rows, self._rows_in(keys))
+            if bx0 <= 0 and by0 <= 0 and bx1 >= self.columns-1 and by1 >= self.grid_rows-1:
+                break
+            if len(rows) >= k:
+                kth = np.partition(box_gaps(boxes[rows], left, right, top, bottom), k-1)[k-1]
+                edge = min(left - (self.origin_x + bx0*self.cell_size) + 1, self.origin_x + (bx1+1)*self.cell_size - right,
+                           top - (self.origin_y + by0*self.cell_size) + 1, self.origin_y + (by1+1)*self.cell_size - bottom)
+                if kth < max(0, edge):
+                    break
+            ring += 1
+
+        distance = box_gaps(boxes[rows], left, right, top, bottom)
+        return rows[np.lexsort((rows, distance))[:k]]
+
+class pageSpatialIndex:
+
+    # Box queries over the region, line and word tables of a pageGeometry. Query boxes may be
+    # QSRRectangles, BoxCoords or (left, right, top, bottom) tuples. Results are the page
+    # objects, or table rows with return_rows=True.
+
+    def __init__(self, geometry, levels=('region', 'line', 'word'), cell_size=None):
+
+        self.geometry = geometry
+        self.grids = dict([(lvl, gridIndex(geometry[lvl], cell_size)) for lvl in levels])
+
+    def _result(self, level, rows, return_rows):
+
+        if return_rows:
+            return rows
+        objects = self.grids[level].table.objects
+        return [objects[i] for i in rows]
+
+    def query_intersecting(self, box, level='word', return_rows=False):
+
+        left, right, top, bottom = _query_box(box)
+        grid = self.grids[level]
+        rows = grid.candidates(left, right, top, bottom)
+        boxes = grid.table.boxes[rows]
+        keep = (boxes[:, 0] <= right) & (boxes[:, 1] >= left) & (boxes[:, 2] <= bottom) & (boxes[:, 3] >= top)
+        return self._result(level, rows[keep], return_rows)
+
+    def query_contained(self, box, level='word', return_rows=False):
+
+        left, right, top, bottom = _query_box(box)
+        grid = self.grids[level]
+        rows = grid.candidates(left, right, top, bottom)
+        boxes = grid.table.boxes[rows]
+        keep = (boxes[:, 0] >= left) & (boxes[:, 1] <= right) & (boxes[:, 2] >= top) & (boxes[:, 3] <= bottom)
+        return self._result(level, rows[keep], return_rows)
+
+    def query_point(self, x, y, level='word', return_rows=False):
+
+        return self.query_intersecting((x, x, y, y), level, return_rows)
+
+    def nearest(self, box, k=1, level='word', return_rows=False):
+
+        # Ordered by the gap between the boxes (0 where they touch or overlap)
+        left, right, top, bottom = _query_box(box)
+        return self._result(level, self.grids[level].nearest(left, right, top, bottom, k), return_rows)
@@ -0,0 +1,340 @@
+import lxml.etree
+import copy
+import datetime
+import io
+import re
+from collections import defaultdict
+
+# Writes PAGE XML from the in-memory regions, lines and words. Output is streamed with
+# lxml.etree.xmlfile so no second tree is built.
+# Coords, baselines, lines, words and text come from the model; attributes and every child
+# the model does not cover (TextStyle, Glyph, TextEquiv conf and PlainText, nested regions,
+# ...) are copied from the source element in their original place, so an unmodified page
+# is written back unchanged. Metadata and the non-region children of Page are copied too.
+
+NS_URI = "http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15"
+NS = f"{{{NS_URI}}}"
+NSMAP = {None : NS_URI}
+REGION_TAGS = {'text' : 'TextRegion', 'image' : 'ImageRegion'}
+CUSTOM_INDEX = re.compile(r"readingOrder \{index:\d+;\}")
+# Children whose tails are written by the region, line or word they hold
+OWN_TAIL = ['TextRegion', 'ImageRegion', 'TextLine', 'Word']
+
+def _local(tag):
+
+    # Tag without its namespace; None for comments and processing instructions
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit('}', 1)[-1]
+
+def _unicode(text_equiv):
+
+    for x in text_equiv:
+        if _local(x.tag) == 'Unicode':
+            return x.text
+    return None
+
+def element_shell(element, children_tags=()):
+
+    # Copy of a source element without what the model writes back itself: the points of
+    # Coords and Baseline, and the child regions, lines or words (one empty placeholder keeps
+    # their place among the other children)
+    shell = copy.deepcopy(element)
+    shell.tail = None
+    placeholder = None
+    for x in list(shell):
+        name = _local(x.tag)
+        if name in ['Coords', 'Baseline']:
+            x.attrib.pop('points', None)
+        elif name in children_tags:
+            if placeholder is None:
+                placeholder = x
+                x.clear()
+            else:
+                shell.remove(x)
+    return shell
+
+class pageWriter(object):
+
+    def __init__(self, page):
+
+        self.page = page
+        self._order = None
+
+    def write_to_file(self, file_name):
+
+        with lxml.etree.xmlfile(str(file_name), encoding='UTF-8') as xf:
+            self._write_page(xf)
+
+    def write(self, output):
+
+        # output is a file name or a binary file-like object
+        with lxml.etree.xmlfile(output, encoding='UTF-8') as xf:
+            self._write_page(xf)
+
+    def to_bytes(self):
+
+        output = io.BytesIO()
+        self.write(output)
+        return output.getvalue()
+
+    def _page_element(self):
+
+        if self.page.page is not None:
+            return self.page.page
+        return self.page._page_shell
+
+    def _root_element(self):
+
+        if self.page.xml_root is not None:
+            return self.page.xml_root
+        return self.page._root_shell
+
+    def _write_page(self, xf):
+
+        xf.write_declaration()
+        root = self._root_element()
+        root_attrib = {} if root is None else dict(root.attrib)
+        with xf.element(f"{NS}PcGts", root_attrib, nsmap=NSMAP if root is None else root.nsmap):
+            if root is not None and root.text is not None:
+                xf.write(root.text)
+            self._write_metadata(xf)
+
+            page_element = self._page_element()
+            page_attrib = {} if page_element is None else dict(page_element.attrib)
+            page_attrib['imageFilename'] = str(self.page.image_file)
+            page_attrib['imageWidth'] = str(self.page.image_width)
+            page_attrib['imageHeight'] = str(self.page.image_height)
+            self._order = self._region_order(page_element)
+            with xf.element(f"{NS}Page", page_attrib):
+                # PrintSpace and region types that are not modelled are copied
+                self._write_children(xf, page_element, [(('ReadingOrder',), lambda x : self._write_reading_order(xf, x)),
+                                                        (tuple(REGION_TAGS.values()), lambda x : self._write_regions(xf))])
+            if page_element is not None and page_element.tail is not None:
+                xf.write(page_element.tail)
+
+    @staticmethod
+    def _region_refs(page_element):
+
+        # Region ids in the top level OrderedGroup of ReadingOrder, by index
+        if page_element is None:
+            return []
+        for x in page_element:
+            if _local(x.tag) == 'ReadingOrder':
+                for group in x:
+                    if _local(group.tag) == 'OrderedGroup':
+                        refs = [y for y in group if _local(y.tag) == 'RegionRefIndexed']
+                        return [y.get('regionRef') for y in sorted(refs, key=lambda y : int(y.get('index', 0)))]
+        return []
+
+    def _region_order(self, page_element):
+
+        # Region ids in reading order once a region was split: the pieces of a region take its
+        # place in ReadingOrder, in page order, and regions it does not list follow at the end.
+        # None while no region was split, so the parsed order is written unchanged
+        if not any([reg._split for reg in self.page.regions]):
+            return None
+        pieces = defaultdict(list)
+        for reg in self.page.regions:
+            source = reg.source
+            pieces[reg.id if source is None else source.get('id', reg.id)].append(reg.id)
+        order = []
+        for ref in self._region_refs(page_element):
+            order.extend(pieces.pop(ref, [ref]))
+        for ids in pieces.values():
+            order.extend(ids)
+        return dict([(reg_id, i) for i, reg_id in enumerate(order)])
+
+    def _write_reading_order(self, xf, element):
+
+        if element is None:
+            return False
+        if self._order is None:
+            xf.write(element, with_tail=False)
+            return True
+        # Relist the OrderedGroup with the split regions' pieces
+        element = copy.deepcopy(element)
+        group = next((x for x in element if _local(x.tag) == 'OrderedGroup'), None)
+        refs = [] if group is None else [x for x in group if _local(x.tag) == 'RegionRefIndexed']
+        if len(refs) > 0:
+            at = group.index(refs[0])
+            tails = [x.tail for x in refs]
+            for x in refs:
+                group.remove(x)
+            order = sorted(self._order, key=self._order.get)
+            for i, reg_id in enumerate(order):
+                ref = lxml.etree.Element(refs[0].tag, {'index' : str(i), 'regionRef' : reg_id})
+                ref.tail = tails[-1] if i == len(order)-1 else tails[0]
+                group.insert(at+i, ref)
+        xf.write(element, with_tail=False)
+        return True
+
+    @staticmethod
+    def _renumber(attrib, index):
+
+        # Sets the readingOrder index in a Transkribus custom attribute that has one
+        if 'custom' in attrib:
+            attrib['custom'] = CUSTOM_INDEX.sub(f"readingOrder {{index:{index};}}", attrib['custom'])
+
+    def _write_metadata(self, xf):
+
+        if self.page.metadata is not None:
+            xf.write(self.page.metadata)
+            return
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with xf.element(f"{NS}Metadata"):
+            for tag, text in [('Creator', 'DocQSR'), ('Created', now), ('LastChange', now)]:
+                with xf.element(f"{NS}{tag}"):
+                    xf.write(text)
+
+    @staticmethod
+    def _write_children(xf, source, parts, keep=None):
+
+        # parts are (tags, write) pairs in schema order. Each part is written in place of the
+        # first child of source with one of its tags; write gets that child, or None if source
+        # has none, and returns whether later children with those tags are copied as well.
+        # Regions, lines and words write their own tails. Other children of source are copied
+        # unchanged, or only those passing keep
+        if source is None:
+            for tags, write in parts:
+                write(None)
+            return
+        if source.text is not None:
+            xf.write(source.text)
+        done = {}
+        for x in source:
+            name = _local(x.tag)
+            part = next((i for i, (tags, write) in enumerate(parts) if name in tags), None)
+            if part is None:
+                if keep is None or keep(x):
+                    xf.write(x)
+                continue
+            if part in done:
+                if done[part]:
+                    xf.write(x)
+                continue
+            for i in range(part):
+                if i not in done:
+                    done[i] = parts[i][1](None)
+            done[part] = parts[part][1](x)
+            if name not in OWN_TAIL and x.tail is not None:
+                xf.write(x.tail)
+        for i, (tags, write) in enumerate(parts):
+            if i not in done:
+                done[i] = write(None)
+
+    @staticmethod
+    def _write_tail(xf, item):
+
+        if item.element is not None and item.element.tail is not None:
+            xf.write(item.element.tail)
+
+    @staticmethod
+    def _write_coords(xf, tag, coords, source=None):
+
+        # source is the parsed Coords/Baseline element, whose other attributes are kept
+        points = None if coords is None else coords.raw
+        if points is None and coords is not None:
+            box = coords.box
+            if box is not None:
+                points = f"{box.left},{box.top} {box.left},{box.bottom} {box.right},{box.bottom} {box.right},{box.top}"
+        if points is None:
+            return True
+        attrib = {} if source is None else dict(source.attrib)
+        attrib['points'] = points
+        with xf.element(f"{NS}{tag}", attrib):
+            pass
+        return True
+
+    @staticmethod
+    def _write_text(xf, text):
+
+        if text is None:
+            return
+        with xf.element(f"{NS}TextEquiv"):
+            with xf.element(f"{NS}Unicode"):
+                xf.write(text)
+
+    def _write_text_equiv(self, xf, text, text_equiv, source):
+
+        # The parsed TextEquiv (with conf, PlainText and any alternatives) is kept while its
+        # text is unchanged, otherwise a new one is written. No TextEquiv is added for an empty
+        # text where the source had none
+        if text_equiv is not None and (_unicode(text_equiv) or '') == (text or ''):
+            xf.write(text_equiv, with_tail=False)
+            return True
+        if text_equiv is None and source is not None and not text:
+            return False
+        self._write_text(xf, text)
+        return False
+
+    def _write_region_text(self, xf, region, text_equiv, source):
+
+        # Unsplit regions keep their parsed text; split pieces get the text of their lines
+        if not region._split and text_equiv is not None:
+            xf.write(text_equiv, with_tail=False)
+            return True
+        if region.has_text_equiv and (region._split or source is None):
+            self._write_text(xf, "\n".join([ln.text for ln in region.text_lines if ln.text is not None]))
+        return False
+
+    def _write_regions(self, xf):
+
+        for reg in self.page.regions:
+            self._write_region(xf, reg)
+        return False
+
+    def _write_region(self, xf, region):
+
+        attrib = dict(region.attributes)
+        attrib['id'] = region.id
+        if self._order is not None:
+            self._renumber(attrib, self._order[region.id])
+        source = region.source
+        keep = None
+        if region._split and source is not None and source.get('id') != region.id:
+            # Nested regions stay with the piece that keeps the region id
+            keep = lambda x : not (_local(x.tag) or '').endswith('Region')
+        with xf.element(f"{NS}{REGION_TAGS.get(region.region_type, 'TextRegion')}", attrib):
+            self._write_children(xf, source, [(('Coords',), lambda x : self._write_coords(xf, 'Coords', region.coords, x)),
+                                              (('TextLine',), lambda x : self._write_lines(xf, region)),
+                                              (('TextEquiv',), lambda x : self._write_region_text(xf, region, x, source))], keep)
+        self._write_tail(xf, region)
+
+    def _write_lines(self, xf, region):
+
+        # Lines of split regions, and next to split lines, are renumbered in the order written
+        renumber = region._split or any([ln.source is not None and ln.source.get('id') != ln.id for ln in region.text_lines])
+        for i, line in enumerate(region.text_lines):
+            self._write_line(xf, line, i if renumber else None)
+        return False
+
+    def _write_line(self, xf, line, index=None):
+
+        attrib = dict(line.attributes)
+        attrib['id'] = line.id
+        if index is not None:
+            self._renumber(attrib, index)
+        source = line.source
+        with xf.element(f"{NS}TextLine", attrib):
+            self._write_children(xf, source, [(('Coords',), lambda x : self._write_coords(xf, 'Coords', line.coords, x)),
+                                              (('Baseline',), lambda x : self._write_coords(xf, 'Baseline', line.baseline, x)),
+                                              (('Word',), lambda x : self._write_words(xf, line)),
+                                              (('TextEquiv',), lambda x : self._write_text_equiv(xf, line.text, x, source))])
+        self._write_tail(xf, line)
+
+    def _write_words(self, xf, line):
+
+        for word in line.words:
+            self._write_word(xf, word)
+        return False
+
+    def _write_word(self, xf, word):
+
+        attrib = dict(word.attributes)
+        attrib['id'] = word.id
+        source = word.source
+        with xf.element(f"{NS}Word", attrib):
+            self._write_children(xf, source, [(('Coords',), lambda x : self._write_coords(xf, 'Coords', word.coords, x)),
+                                              (('TextEquiv',), lambda x : self._write_text_equiv(xf, word.text, x, source))])
+        self._write_tail(xf, word)
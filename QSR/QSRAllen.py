@@ -6,13 +6,18 @@ class AllenIntervals:
     matrix_lookup = {'finishes':1.4, 'during':1.5, 'starts':1.6,
                      'after':2.1, 'met by':2.2, 'overlapped by': 2.4, 'equals':2.5, 'overlaps':2.6, 'meets':2.8, 'before':2.9,
                      'started by':3.4, 'contains': 3.5, 'finished by': 3.6}
+
+    __slots__ = ('start_point', 'end_point', 'mid_point', 'orientation')
                    
     def __init__(self, start_point, end_point, orientation='horizontal'):
         self.start_point = min(start_point, end_point)
         self.end_point = max(start_point, end_point)
         self.mid_point = (self.end_point+self.start_point)/2
         self.orientation = orientation
-        self.method_identifier = type(self).__name__
+
+    @property
+    def method_identifier(self):
+        return type(self).__name__
 
     #@staticmethod
     def get_matrix_pos(self, description):
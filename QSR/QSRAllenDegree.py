@@ -3,6 +3,8 @@ from .QSRAllen import AllenIntervals
 class AllenOverlapDegree(AllenIntervals):
     
     description_lookup = {'XY': {0 : 'none', 1: 'least', 2: 'mostly', 3:'total'}} # Not reversible, 'YX': {1: 'after', 2: 'overlaps', 3:'before'}}
+
+    __slots__ = ()
                    
     def __init__(self, start_point, end_point, orientation):
         super().__init__(start_point, end_point, orientation)
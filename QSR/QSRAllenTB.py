@@ -4,6 +4,8 @@ class AllenIntervalsTB(AllenIntervals):
     
     description_lookup = {'XY': {1: 'before', 2: 'equals', 3: 'meets', 4: 'overlaps', 5: 'contains', 6: 'starts', 7: 'finishes'},
                    'YX': {1: 'after', 2: 'equals', 3: 'met by', 4: 'overlapped by', 5: 'during', 6: 'started by', 7: 'finished by'}}
+
+    __slots__ = ('T',)
                    
     def __init__(self, start_point, end_point, orientation='horizontal', T=0):
         super().__init__(start_point, end_point, orientation)
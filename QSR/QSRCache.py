@@ -0,0 +1,94 @@
+from collections import OrderedDict, namedtuple, defaultdict
+from .QSRAllen import AllenIntervals
+from .QSRAllenTB import AllenIntervalsTB
+
+# Bounded LRU memo of pairwise relations between rectangles. Entries are keyed on the two
+# boxes and the relation family; relations depend only on coordinates, so equal boxes share
+# entries and a rectangle whose sides are changed simply misses. Hits and misses are counted
+# per family.
+
+cacheInfo = namedtuple('cacheInfo', 'hits misses maxsize currsize')
+
+class relationCache:
+
+    def __init__(self, maxsize=65536):
+
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def get(self, key, compute):
+
+        # key is (box, box, family); compute() is called on a miss
+        family = key[2]
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self._misses[family] += 1
+            value = compute()
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+        self._hits[family] += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def rcc8(self, rect_a, rect_b):
+
+        return self.get((rect_a.bbox, rect_b.bbox, 'rcc8'), lambda : rect_a.get_rcc8_class(rect_b))
+
+    def direction(self, rect_a, rect_b):
+
+        return self.get((rect_a.bbox, rect_b.bbox, 'direction'), lambda : rect_a.get_direction_of_other(rect_b))
+
+    def allen(self, rect_a, rect_b, orientation='horizontal', interval_class=AllenIntervals, T=0):
+
+        # The relationship code dict of the two intervals. Intervals are built from the current
+        # boxes, matching the key, rather than taken from those stored on the rectangles, which
+        # are not rebuilt when a side changes. T is the tolerance of the TB families. A copy is
+        # returned so callers cannot change the cached entry
+        tolerant = issubclass(interval_class, AllenIntervalsTB)
+        if T != 0 and not tolerant:
+            raise ValueError(f"{interval_class.__name__} does not take a tolerance")
+
+        def compute():
+            intervals = []
+            for box in (rect_a.bbox, rect_b.bbox):
+                start, end = (box.left, box.right) if orientation == 'horizontal' else (box.top, box.bottom)
+                if tolerant:
+                    intervals.append(interval_class(start, end, orientation, T=T))
+                else:
+                    intervals.append(interval_class(start, end, orientation))
+            return intervals[0].get_relationship_code(intervals[1])
+
+        family = ('allen', interval_class.__name__, orientation, T)
+        value = self.get((rect_a.bbox, rect_b.bbox, family), compute)
+        return None if value is None else dict(value)
+
+    @property
+    def hits(self):
+
+        return sum(self._hits.values())
+
+    @property
+    def misses(self):
+
+        return sum(self._misses.values())
+
+    def info(self, family=None):
+
+        if family is None:
+            return cacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+        return cacheInfo(self._hits[family], self._misses[family], self.maxsize, len([k for k in self._entries if k[2] == family]))
+
+    def clear(self):
+
+        self._entries.clear()
+        self._hits.clear()
+        self._misses.clear()
@@ -0,0 +1,239 @@
+import numpy as np
+from itertools import product
+from .QSRAllen import AllenIntervals
+from .QSRMatrix import RCC8_CODES, RCC8_LOOKUP, allen_pairs, rcc8_pairs
+
+# Composition tables for the signed AllenIntervals codes of allen_pairs and the RCC8 codes
+# (indices into RCC8_CODES) of rcc8_pairs, so relations along a sparse set of pairs can be propagated to the rest. Sets of
+# relations are bitmasks with one bit per basic relation. Both tables are generated from the
+# repo's own classifiers by enumerating intervals over a small integer range, which covers
+# every ordering of the endpoints of three intervals. For rectangles the RCC8 code depends only
+# on the Allen relations of the two axes, so the RCC8 table is derived from Allen x Allen.
+# Zero length intervals and boxes (code 0 from allen_pairs) are outside both tables.
+
+ALLEN_CODES = (1, -1, 2, 3, -3, 4, -4, 5, -5, 6, -6, 7, -7)
+
+# Endpoints 0..6 give every ordering of the six endpoints of three intervals
+ENUMERATION_RANGE = 7
+
+def _intervals():
+
+    starts, ends = zip(*[(s, e) for s in range(ENUMERATION_RANGE) for e in range(s+1, ENUMERATION_RANGE)])
+    return (np.array(starts), np.array(ends))
+
+class compositionTable:
+
+    # Basic relations are listed in codes; a mask holds bit k for codes[k]
+    def __init__(self, name, codes, composition, converse, identity):
+
+        self.name = name
+        self.codes = tuple(codes)
+        self.index = dict([(c, k) for k, c in enumerate(self.codes)])
+        self.composition = composition
+        self.converse_masks = converse
+        self.universal = (1 << len(self.codes)) - 1
+        self.identity = 1 << self.index[identity]
+        self._cache = {}
+
+    def mask(self, code):
+
+        # Unknown codes (such as 0 for a zero length interval) constrain nothing
+        k = self.index.get(code)
+        return self.universal if k is None else 1 << k
+
+    def masks(self, codes):
+
+        lookup = dict([(c, 1 << k) for k, c in enumerate(self.codes)])
+        return np.array([lookup.get(c, self.universal) for c in np.asarray(codes).tolist()], dtype=np.int64)
+
+    def relations(self, mask):
+
+        return [c for k, c in enumerate(self.codes) if mask >> k & 1]
+
+    def _bits(self, mask):
+
+        return [k for k in range(len(self.codes)) if mask >> k & 1]
+
+    def compose(self, mask_ab, mask_bc):
+
+        # Possible A-C relations given A-B in mask_ab and B-C in mask_bc
+        key = (mask_ab, mask_bc)
+        if key in self._cache:
+            return self._cache[key]
+        result = 0
+        for a in self._bits(mask_ab):
+            for b in self._bits(mask_bc):
+                result |= int(self.composition[a, b])
+                if result == self.universal:
+                    break
+        self._cache[key] = result
+        return result
+
+    def converse(self, mask):
+
+        result = 0
+        for a in self._bits(mask):
+            result |= int(self.converse_masks[a])
+        return result
+
+def _allen_index(codes):
+
+    lookup = np.full(2*max(ALLEN_CODES)+1, -1)
+    lookup[np.array(ALLEN_CODES) + max(ALLEN_CODES)] = np.arange(len(ALLEN_CODES))
+    return lookup[np.asarray(codes, dtype=np.int64) + max(ALLEN_CODES)]
+
+def allen_composition():
+
+    # Allen relation of every ordered pair and triple of enumerated intervals
+    starts, ends = _intervals()
+    n = len(starts)
+    a, b, c = [x.ravel() for x in np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing='ij')]
+    ab = _allen_index(allen_pairs(starts[a], ends[a], starts[b], ends[b], AllenIntervals))
+    bc = _allen_index(allen_pairs(starts[b], ends[b], starts[c], ends[c], AllenIntervals))
+    ac = _allen_index(allen_pairs(starts[a], ends[a], starts[c], ends[c], AllenIntervals))
+
+    size = len(ALLEN_CODES)
+    composition = np.zeros((size, size), dtype=np.int64)
+    np.bitwise_or.at(composition, (ab, bc), 1 << ac)
+    converse = np.zeros(size, dtype=np.int64)
+    np.bitwise_or.at(converse, ab, 1 << _allen_index(allen_pairs(starts[b], ends[b], starts[a], ends[a], AllenIntervals)))
+    return compositionTable('allen', ALLEN_CODES, composition, converse, 2)
+
+def rcc8_allen_lookup():
+
+    # RCC8 code of two rectangles indexed by their horizontal and vertical Allen relations,
+    # checked to be the same for every enumerated pair of rectangles
+    starts, ends = _intervals()
+    n = len(starts)
+    a, b = [x.ravel() for x in np.meshgrid(np.arange(n), np.arange(n), indexing='ij')]
+    allen = _allen_index(allen_pairs(starts[a], ends[a], starts[b], ends[b], AllenIntervals))
+    h, v = [x.ravel() for x in np.meshgrid(np.arange(len(a)), np.arange(len(a)), indexing='ij')]
+    boxes_a = np.stack([starts[a[h]], ends[a[h]], starts[a[v]], ends[a[v]]], axis=1)
+    boxes_b = np.stack([starts[b[h]], ends[b[h]], starts[b[v]], ends[b[v]]], axis=1)
+    codes = rcc8_pairs(boxes_a, boxes_b)
+
+    size = len(ALLEN_CODES)
+    lookup = np.full((size, size), -1, dtype=np.int8)
+    lookup[allen[h], allen[v]] = codes
+    if (lookup[allen[h], allen[v]] != codes).any():
+        raise ValueError("RCC8 is not determined by the Allen relations of the two axes")
+    return lookup
+
+def rcc8_rectangle_composition(allen=None):
+
+    allen = allen_composition() if allen is None else allen
+    lookup = rcc8_allen_lookup()
+    size = len(ALLEN_CODES)
+    bits = (allen.composition[..., None] >> np.arange(size)) & 1
+    onehot = np.eye(len(RCC8_CODES), dtype=np.int64)[lookup]
+
+    # reach[h1, h2, v1, v2, r]: some h3 in h1.h2 and v3 in v1.v2 give RCC8 code r
+    per_h = np.einsum('abx,xyr->abyr', bits, onehot)
+    reach = np.einsum('abyr,cdy->abcdr', per_h, bits) > 0
+
+    masks = (reach * (1 << np.arange(len(RCC8_CODES)))).sum(axis=-1)
+    h1, h2, v1, v2 = np.meshgrid(*[np.arange(size)]*4, indexing='ij')
+    composition = np.zeros((len(RCC8_CODES), len(RCC8_CODES)), dtype=np.int64)
+    np.bitwise_or.at(composition, (lookup[h1, v1].ravel(), lookup[h2, v2].ravel()), masks.ravel())
+
+    converse = np.zeros(len(RCC8_CODES), dtype=np.int64)
+    flip = _allen_index([-c if c != 2 else 2 for c in ALLEN_CODES])
+    for h, v in product(range(size), repeat=2):
+        converse[lookup[h, v]] |= 1 << int(lookup[flip[h], flip[v]])
+    return compositionTable('rcc8', range(len(RCC8_CODES)), composition, converse, RCC8_LOOKUP['EQ'])
+
+def rcc8_from_allen(h_codes, v_codes):
+
+    # RCC8 codes (indexing RCC8_CODES) from allen_pairs codes of the two axes, -1 for code 0
+    h = _allen_index(h_codes)
+    v = _allen_index(v_codes)
+    codes = RCC8_ALLEN[h, v]
+    return np.where((h < 0) | (v < 0), -1, codes).astype(np.int8)
+
+class relationNetwork:
+
+    # Constraints between numbered objects held sparsely as {i: {j: mask}}, always with the
+    # converse stored on (j, i). Pairs without an entry are unconstrained.
+    def __init__(self, table, size=None):
+
+        self.table = table
+        self.size = size
+        self.edges = {}
+
+    def relation(self, i, j):
+
+        if i == j:
+            return self.table.identity
+        return self.edges.get(i, {}).get(j, self.table.universal)
+
+    def _set(self, i, j, mask):
+
+        self.edges.setdefault(i, {})[j] = mask
+        self.edges.setdefault(j, {})[i] = self.table.converse(mask)
+
+    def constrain(self, i, j, mask):
+
+        # Intersect the i-j relation with mask; returns the new mask (0 if inconsistent)
+        current = self.relation(i, j)
+        new = current & mask
+        if new != current or j not in self.edges.get(i, {}):
+            self._set(i, j, new)
+        return new
+
+    def add_codes(self, sources, targets, codes):
+
+        for i, j, mask in zip(np.asarray(sources).tolist(), np.asarray(targets).tolist(), self.table.masks(codes).tolist()):
+            if i != j:
+                self.constrain(i, j, mask)
+
+    def path_consistency(self, infer=False):
+
+        # Refine i-k by i-j . j-k until nothing changes. With infer=False only existing pairs
+        # are refined; with infer=True pairs gain an entry wherever composition says
+        # something, which can fill in the network up to n squared pairs.
+        # Returns False as soon as some pair has no possible relation.
+        table = self.table
+        queue = [(i, j) for i in self.edges for j in self.edges[i]]
+        queued = set(queue)
+        while queue:
+            i, j = queue.pop()
+            queued.discard((i, j))
+            ij = self.relation(i, j)
+            for k in list(self.edges.get(j, {})):
+                if k == i:
+                    continue
+                known = k in self.edges.get(i, {})
+                if not known and not infer:
+                    continue
+                implied = table.compose(ij, self.edges[j][k])
+                current = self.relation(i, k)
+                new = current & implied
+                if new == current and known:
+                    continue
+                if new == table.universal:
+                    continue
+                self._set(i, k, new)
+                if new == 0:
+                    return False
+                for pair in ((i, k), (k, i)):
+                    if pair not in queued:
+                        queued.add(pair)
+                        queue.append(pair)
+        return True
+
+    def pairs(self):
+
+        return [(i, j, mask) for i in self.edges for j, mask in self.edges[i].items()]
+
+ALLEN_TABLE = allen_composition()
+RCC8_ALLEN = rcc8_allen_lookup()
+RCC8_TABLE = rcc8_rectangle_composition(ALLEN_TABLE)
+
+if __name__ == '__main__':
+
+    table = ALLEN_TABLE
+    for a, b in [(1, 1), (4, 4), (3, -3), (5, -5)]:
+        print(a, b, table.relations(table.compose(table.mask(a), table.mask(b))))
+    for a, b in [('EC', 'EC'), ('NTPP', 'NTPP'), ('TPP', 'NTPPi')]:
+        mask = RCC8_TABLE.compose(RCC8_TABLE.mask(RCC8_LOOKUP[a]), RCC8_TABLE.mask(RCC8_LOOKUP[b]))
+        print(a, b, [RCC8_CODES[c] for c in RCC8_TABLE.relations(mask)])
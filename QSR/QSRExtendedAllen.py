@@ -24,6 +24,8 @@ class ExtendedAllenIntervals(AllenIntervals):
     for k,v in AllenIntervals.description_lookup['YX'].items():
         extension_descriptions['YX'][k] = v
 
+    __slots__ = ()
+
 
     def __init__(self, start_point, end_point, orientation):
         super().__init__(start_point, end_point, orientation)
@@ -0,0 +1,274 @@
+import numpy as np
+from .QSRRectangle import QSRRectangle, BoxCoords
+from .QSRAllen import AllenIntervals
+from .QSRExtendedAllen import ExtendedAllenIntervals
+from .QSRAllenTB import AllenIntervalsTB
+from .QSRSimpleTB import SimpleAllenIntervalsTB
+from .QSRSimpleAllen_3 import SimpleAllenIntervals3
+from .QSRAllenDegree import AllenOverlapDegree
+
+# Vectorised counterparts of the pairwise QSRRectangle relations. Boxes are (N,4) arrays in
+# BoxCoords column order (left, right, top, bottom); every test mirrors the scalar method it
+# replaces so the codes match one pair at a time results exactly.
+
+RCC8_CODES = ('DC', 'EC', 'EQ', 'TPP', 'NTPP', 'TPPi', 'NTPPi', 'PO')
+RCC8_LOOKUP = dict([(c, i) for i, c in enumerate(RCC8_CODES)])
+
+# Rows per block when building full matrices, to bound the size of the temporaries
+BLOCK_CELLS = 1 << 20
+
+def as_box_array(boxes):
+
+    if isinstance(boxes, np.ndarray):
+        return boxes.reshape(-1, 4).astype(np.int32, copy=False)
+    rows = [b.bbox if isinstance(b, QSRRectangle) else b for b in boxes]
+    return np.array(rows, dtype=np.int32).reshape(-1, 4)
+
+def _columns(boxes):
+
+    return tuple([boxes[..., k] for k in range(boxes.shape[-1])])
+
+def _horizontal_overlap(a, b):
+
+    al, ar, at, ab = a
+    bl, br, bt, bb = b
+    return ((al <= bl) & (bl <= ar)) | ((al <= br) & (br <= ar)) | ((bl <= ar) & (br >= ar))
+
+def _vertical_overlap(a, b):
+
+    al, ar, at, ab = a
+    bl, br, bt, bb = b
+    return ((at <= bb) & (bb <= ab)) | ((at <= bt) & (bt <= ab)) | ((bt <= at) & (bb >= ab))
+
+def _horizontal_abuttal(a, b):
+
+    al, ar, at, ab = a
+    bl, br, bt, bb = b
+    return (np.maximum(ar, br) - np.minimum(al, bl)) == (ar - al) + (br - bl)
+
+def _vertical_abuttal(a, b):
+
+    al, ar, at, ab = a
+    bl, br, bt, bb = b
+    return (np.maximum(ab, bb) - np.minimum(at, bt)) == (ab - at) + (bb - bt)
+
+def _externally_connected(h_overlap, v_overlap, h_abut, v_abut):
+
+    return (h_abut & (v_abut | v_overlap)) | (v_abut & (h_abut | h_overlap))
+
+def _equal(a, b):
+
+    return (a[0] == b[0]) & (a[1] == b[1]) & (a[2] == b[2]) & (a[3] == b[3])
+
+def _proper_part(a, b, overlap):
+
+    # QSRRectangle.is_proper_part, including its use of is_below (bottom < other bottom)
+    al, ar, at, ab = a
+    bl, br, bt, bb = b
+    return overlap & (at >= bt) & (ab >= bb) & (al >= bl) & (ar <= br)
+
+def _rcc8_codes(a, b):
+
+    h_overlap = _horizontal_overlap(a, b)
+    v_overlap = _vertical_overlap(a, b)
+    overlap = h_overlap & v_overlap
+    connected = _externally_connected(h_overlap, v_overlap, _horizontal_abuttal(a, b), _vertical_abuttal(a, b))
+    equal = _equal(a, b)
+    tangential = ~equal & ((a[0] == b[0]) | (a[1] == b[1]) | (a[2] == b[2]) | (a[3] == b[3]))
+    part = _proper_part(a, b, overlap)
+    inverse_part = _proper_part(b, a, _horizontal_overlap(b, a) & _vertical_overlap(b, a))
+
+    # Assigned from lowest to highest precedence, following get_rcc8_class
+    codes = np.full(np.broadcast(*a, *b).shape, RCC8_LOOKUP['PO'], dtype=np.int8)
+    codes[inverse_part] = RCC8_LOOKUP['NTPPi']
+    codes[inverse_part & tangential] = RCC8_LOOKUP['TPPi']
+    codes[part] = RCC8_LOOKUP['NTPP']
+    codes[part & tangential] = RCC8_LOOKUP['TPP']
+    codes[equal] = RCC8_LOOKUP['EQ']
+    codes[connected] = RCC8_LOOKUP['EC']
+    codes[~overlap & ~connected] = RCC8_LOOKUP['DC']
+    return codes
+
+def _block_matrix(func, boxes_a, boxes_b, dtype):
+
+    result = np.empty((len(boxes_a), len(boxes_b)), dtype=dtype)
+    b = _columns(boxes_b[np.newaxis, :, :])
+    step = max(1, BLOCK_CELLS // max(1, len(boxes_b)))
+    for start in range(0, len(boxes_a), step):
+        a = _columns(boxes_a[start:start+step, np.newaxis, :])
+        result[start:start+step] = func(a, b)
+    return result
+
+def rcc8_matrix(boxes_a, boxes_b=None):
+
+    # N x M int8 codes indexing RCC8_CODES; entry [i, j] is boxes_a[i].get_rcc8_class(boxes_b[j])
+    boxes_a = as_box_array(boxes_a)
+    boxes_b = boxes_a if boxes_b is None else as_box_array(boxes_b)
+    return _block_matrix(_rcc8_codes, boxes_a, boxes_b, np.int8)
+
+def rcc8_pairs(boxes_a, boxes_b):
+
+    # Element-wise codes for aligned pairs (boxes_a[k], boxes_b[k])
+    return _rcc8_codes(_columns(as_box_array(boxes_a)), _columns(as_box_array(boxes_b)))
+
+def rcc8_names(codes):
+
+    return np.array(RCC8_CODES, dtype=object)[codes]
+
+# get_direction_of_other codes: 0 connected, then clockwise from 1 north to 8 north west
+DIRECTION_CODES = ('C', 'N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')
+
+def _direction_codes(a, b):
+
+    h_overlap = _horizontal_overlap(a, b)
+    v_overlap = _vertical_overlap(a, b)
+    connected = (h_overlap & v_overlap) | \
+                _externally_connected(h_overlap, v_overlap, _horizontal_abuttal(a, b), _vertical_abuttal(a, b))
+
+    # Orientation of a relative to b, -1/0/1 as in the scalar method (is_below, is_leftof)
+    vertical = np.where(v_overlap, 0, np.where(a[3] < b[3], -1, 1))
+    horizontal = np.where(h_overlap, 0, np.where(a[0] < b[0], -1, 1))
+    codes = np.where(horizontal == 0, 1 + (vertical > 0)*4, 3 - vertical*horizontal + (horizontal > 0)*4)
+    return np.where(connected, 0, codes).astype(np.int8)
+
+def direction_matrix(boxes_a, boxes_b=None):
+
+    # N x M int8 codes; entry [i, j] is boxes_a[i].get_direction_of_other(boxes_b[j])
+    boxes_a = as_box_array(boxes_a)
+    boxes_b = boxes_a if boxes_b is None else as_box_array(boxes_b)
+    return _block_matrix(_direction_codes, boxes_a, boxes_b, np.int8)
+
+def direction_pairs(boxes_a, boxes_b):
+
+    # Element-wise codes for aligned pairs (boxes_a[k], boxes_b[k])
+    return _direction_codes(_columns(as_box_array(boxes_a)), _columns(as_box_array(boxes_b)))
+
+# Allen interval families. Codes are signed: +value where the scalar lookup gives
+# {'value': value, 'direction': 'XY'}, -value for 'YX' and 0 where the value is None.
+# ExtendedAllenIntervals values such as 4.1 are returned as float64.
+
+def _allen_calc(xs, xe, ys, ye, T):
+
+    conditions = [(xs < xe) & (xe < ys) & (ys < ye),
+                  (xs == ys) & (ys < xe) & (xe == ye),
+                  (xs < xe) & (xe == ys) & (ys < ye),
+                  (xs < ys) & (ys < xe) & (xe < ye),
+                  (ys < xs) & (xs < xe) & (xe < ye),
+                  (xs == ys) & (ys < xe) & (xe < ye),
+                  (ys < xs) & (xs < xe) & (xe == ye)]
+    return np.select(conditions, [1, 2, 3, 4, 5, 6, 7], default=0)
+
+def _allen_tb_calc(xs, xe, ys, ye, T):
+
+    start_near = (ys-T <= xs) & (xs <= ys+T)
+    end_near = (ye-T <= xe) & (xe <= ye+T)
+    conditions = [xe < ys-T,
+                  start_near & end_near,
+                  (ys-T <= xe) & (xe <= ys+T),
+                  (xs < ys-T) & (ys+T < xe) & (xe < ye-T),
+                  (xs > ys+T) & (xe < ye-T),
+                  start_near & (xe < ye-T),
+                  (xs > ys+T) & end_near]
+    return np.select(conditions, [1, 2, 3, 4, 5, 6, 7], default=0)
+
+def _simple_3_calc(xs, xe, ys, ye, T):
+
+    return np.select([xe < ys, ye < xs], [1, 3], default=2)
+
+def _overlap_degree_calc(xs, xe, ys, ye, T):
+
+    x_len = xe-xs
+    x_overlap = np.minimum(xe, ye) - np.maximum(xs, ys)
+    conditions = [xs >= ye, xe <= ys, x_overlap == x_len, x_overlap >= x_len / 2]
+    return np.select(conditions, [0, 0, 3, 2], default=1)
+
+def _extend(s, e, mid, os, oe, omid, relationship):
+
+    # ExtendedAllenIntervals._extend applied to every pair at once, adding the increments in
+    # the same order so the float values are identical
+    relationship = relationship.astype(np.float64)
+    is_4 = relationship == 4
+    step = np.select([(s < os) & (e < oe) & (mid >= os) & (e >= omid),
+                      (s < os) & (mid >= os) & (e < omid),
+                      (mid < os) & (e >= omid) & (e < oe),
+                      (mid < os) & (e > os) & (e < omid)], [0.1, 0.2, 0.3, 0.4], default=0.0)
+    relationship = np.where(is_4, relationship + step, relationship)
+    is_5 = relationship == 5
+    relationship = np.where(is_5 & (s > os) & (e <= omid), relationship + 0.1, relationship)
+    relationship = np.where(is_5 & (s > os) & (s < omid) & (e > omid) & (e < oe), relationship + 0.2, relationship)
+    relationship = np.where(is_5 & (s >= omid) & (e < oe), relationship + 0.3, relationship)
+    is_6 = relationship == 6
+    relationship = np.where(is_6 & (e >= omid), relationship + 0.1, relationship)
+    relationship = np.where(is_6 & (e > os) & (e < omid), relationship + 0.2, relationship)
+    is_7 = relationship == 7
+    relationship = np.where(is_7 & (s > os) & (s <= omid), relationship + 0.1, relationship)
+    relationship = np.where(is_7 & (s > omid) & (s < oe), relationship + 0.2, relationship)
+    return relationship
+
+ALLEN_FAMILIES = {AllenIntervals : _allen_calc,
+                  ExtendedAllenIntervals : _allen_calc,
+                  AllenIntervalsTB : _allen_tb_calc,
+                  SimpleAllenIntervalsTB : _allen_tb_calc,
+                  SimpleAllenIntervals3 : _simple_3_calc,
+                  AllenOverlapDegree : _overlap_degree_calc}
+
+def _allen_codes(a, b, interval_class=AllenIntervals, T=0):
+
+    xs, xe = a
+    ys, ye = b
+    calc = ALLEN_FAMILIES[interval_class]
+    forward = calc(xs, xe, ys, ye, T)
+    if interval_class is AllenOverlapDegree:
+        # 0 is a value ('none') for overlap degree, never a missing relationship
+        return forward.astype(np.int8)
+
+    backward = calc(ys, ye, xs, xe, T)
+    reverse = (forward == 0) & (backward != 0)
+    value = np.where(reverse, backward, forward)
+    if interval_class is not ExtendedAllenIntervals:
+        return np.where(reverse, -value, value).astype(np.int8)
+
+    x_mid = (xe+xs)/2
+    y_mid = (ye+ys)/2
+    extendable = (value >= 4) & (value <= 7)
+    own = _extend(xs, xe, x_mid, ys, ye, y_mid, value)
+    other = _extend(ys, ye, y_mid, xs, xe, x_mid, value)
+    own_changed = extendable & (own != value)
+    other_changed = extendable & ~own_changed & (other != value)
+    # Where neither side extends the scalar code recurses without end; the plain value is kept
+    extended = np.where(own_changed, own, np.where(other_changed, -other, np.where(reverse, -value, value)))
+    return extended.astype(np.float64)
+
+def _as_intervals(starts, ends):
+
+    starts = np.asarray(starts, dtype=np.float64).ravel()
+    ends = np.asarray(ends, dtype=np.float64).ravel()
+    return np.stack([np.minimum(starts, ends), np.maximum(starts, ends)], axis=1)
+
+def allen_matrix(starts_a, ends_a, starts_b=None, ends_b=None, interval_class=AllenIntervals, T=0):
+
+    # N x M signed codes; entry [i, j] matches interval_class(a_i).get_relationship_code(interval_class(b_j))
+    intervals_a = _as_intervals(starts_a, ends_a)
+    intervals_b = intervals_a if starts_b is None else _as_intervals(starts_b, ends_b)
+    dtype = np.float64 if interval_class is ExtendedAllenIntervals else np.int8
+    codes = lambda a, b : _allen_codes(a, b, interval_class, T)
+    return _block_matrix(codes, intervals_a, intervals_b, dtype)
+
+def allen_pairs(starts_a, ends_a, starts_b, ends_b, interval_class=AllenIntervals, T=0):
+
+    return _allen_codes(_columns(_as_intervals(starts_a, ends_a)), _columns(_as_intervals(starts_b, ends_b)), interval_class, T)
+
+def allen_description(code, interval_class=AllenIntervals):
+
+    direction = 'YX' if code < 0 else 'XY'
+    value = abs(code)
+    if interval_class is ExtendedAllenIntervals:
+        return interval_class.extension_descriptions[direction][None if value == 0 else value]
+    if interval_class is AllenOverlapDegree:
+        return interval_class.description_lookup['XY'][int(value)]
+    return interval_class.description_lookup[direction].get(None if value == 0 else int(value))
+
+if __name__ == '__main__':
+
+    boxes = [BoxCoords(20,60,30,70), BoxCoords(0,100,0,100), BoxCoords(25,45,10,30), BoxCoords(90,100,0,10)]
+    print(rcc8_names(rcc8_matrix(boxes)))
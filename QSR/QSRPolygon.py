@@ -0,0 +1,89 @@
+import numpy as np
+
+# Half-plane clipping of point arrays (Sutherland-Hodgman against a single line), vectorised
+# over the edges. Works for either winding and any start point. Closed polygons include the
+# edge from the last point back to the first; open polylines (baselines) do not. axis 0 cuts
+# at a vertical line x = value, axis 1 at a horizontal line y = value.
+
+def _edges(points, closed):
+
+    if closed:
+        return (points, np.concatenate([points[1:], points[:1]]))
+    return (points[:-1], points[1:])
+
+def _drop_repeats(points, closed):
+
+    # Points on the cut line are produced by both the vertex and the crossing test
+    if len(points) < 2:
+        return points
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+    points = points[keep]
+    if closed and len(points) > 1 and np.array_equal(points[0], points[-1]):
+        points = points[:-1]
+    return points
+
+def clip_half_plane(points, value, axis=0, keep='lower', closed=True):
+
+    # Part of the polygon/polyline with coordinate <= value (keep='lower') or >= value
+    # (keep='upper'). Crossing points are interpolated and rounded to the points' dtype
+    points = np.asarray(points)
+    if len(points) == 0:
+        return points.reshape(0, 2)
+    start, end = _edges(points, closed)
+    c_start = start[:, axis]
+    c_end = end[:, axis]
+    if keep == 'lower':
+        in_start = c_start <= value
+        in_end = c_end <= value
+    else:
+        in_start = c_start >= value
+        in_end = c_end >= value
+
+    crossing = in_start != in_end
+    denom = np.where(crossing, c_end-c_start, 1)
+    t = np.where(crossing, (value-c_start)/denom, 0.0)
+    cross_points = start + t[:, None]*(end-start)
+    cross_points[:, axis] = value
+    if np.issubdtype(points.dtype, np.integer):
+        cross_points = np.rint(cross_points)
+    cross_points = cross_points.astype(points.dtype)
+
+    # Each edge emits its start vertex if inside, then its crossing point if it has one
+    candidates = np.stack([start, cross_points], axis=1)
+    emit = np.stack([in_start, crossing], axis=1)
+    clipped = candidates[emit]
+    if not closed:
+        last = points[-1, axis]
+        if (last <= value) if keep == 'lower' else (last >= value):
+            clipped = np.concatenate([clipped, points[-1:]])
+    return _drop_repeats(clipped, closed)
+
+def split_polygon(points, value, axis=0, closed=True):
+
+    # (lower, upper) pieces either side of the line. A side with no point strictly beyond
+    # the line is None and the other side is the whole of the input
+    points = np.asarray(points)
+    if len(points) == 0:
+        return (None, None)
+    coords = points[:, axis]
+    if not np.any(coords < value):
+        return (None, points)
+    if not np.any(coords > value):
+        return (points, None)
+    return (clip_half_plane(points, value, axis, 'lower', closed), clip_half_plane(points, value, axis, 'upper', closed))
+
+def split_bands(points, cuts, axis=0, closed=True):
+
+    # Pieces between consecutive sorted cuts, len(cuts)+1 of them (None where empty), each
+    # cut made once on what remains beyond the previous one
+    pieces = []
+    remaining = points
+    for cut in cuts:
+        if remaining is None:
+            pieces.append(None)
+            continue
+        lower, remaining = split_polygon(remaining, cut, axis, closed)
+        pieces.append(lower)
+    pieces.append(remaining)
+    return pieces
@@ -1,9 +1,17 @@
 import math
+import logging
 from collections import namedtuple
+import numpy as np
 
 BoxCoords = namedtuple('BoxCoords', 'left right top bottom')
 
+logger = logging.getLogger(__name__)
+
 class QSRRectangle:
+
+    # Slotted so that whole volumes of word rectangles can be held at once; bbox is derived
+    # and the intervals dictionary is only created when an interval is added
+    __slots__ = ('identifier', '_left', '_right', '_top', '_bottom', '_intervals')
     
     def __init__(self, coords, identifier=None):
 
@@ -13,14 +21,25 @@ class QSRRectangle:
             self._right = 0
             self._top = 0
             self._bottom = 0
-            print("No coords for identifer:", self.identifier, "Default to zero")
+            logger.warning("No coords for identifier %s, default to zero", self.identifier)
         else:
             self._left = coords.left
             self._right = coords.right
             self._top = coords.top
             self._bottom = coords.bottom
-        self.bbox = BoxCoords(left=self.left, right=self.right, top=self.top, bottom=self.bottom)
-        self.intervals = {'vertical' : {}, 'horizontal' : {}}
+        self._intervals = None
+
+    @property
+    def bbox(self):
+
+        return BoxCoords(left=self._left, right=self._right, top=self._top, bottom=self._bottom)
+
+    @property
+    def intervals(self):
+
+        if self._intervals is None:
+            self._intervals = {'vertical' : {}, 'horizontal' : {}}
+        return self._intervals
 
     def add_interval(self, orientation, interval_class):
 
@@ -33,11 +52,14 @@ class QSRRectangle:
 
         interval = interval_class(start_point=start_point, end_point=end_point, orientation=orientation)
         self.intervals[orientation][interval.method_identifier] = interval
+        return interval
 
     def get_interval(self, orientation, interval_class):
 
-        if interval_class in self.intervals[orientation]:
-            return self.intervals[orientation][interval_class]
+        # Stored under the class name (method_identifier); either the class or its name will do
+        key = interval_class if isinstance(interval_class, str) else interval_class.__name__
+        if key in self.intervals[orientation]:
+            return self.intervals[orientation][key]
         else:
             return None
 
@@ -102,7 +124,7 @@ class QSRRectangle:
         return int((self.left+self.right)/2)
 
     def union(self, other):
-        union_rect = QSRRectangle(left=min(self.left, other.left), right=max(self.right, other.right), top=min(self.top, other.top), bottom=max(self.bottom, other.bottom))
+        union_rect = QSRRectangle(BoxCoords(left=min(self.left, other.left), right=max(self.right, other.right), top=min(self.top, other.top), bottom=max(self.bottom, other.bottom)))
         return union_rect
    
     def intersect(self, other):
@@ -244,6 +266,15 @@ class QSRRectangle:
 
         return ((a_x-b_x)**2 + (a_y-b_y)**2) ** 0.5
 
+    def get_centre_distance(self, other):
+        # Distance between the box centres (get_euclid compares half sizes)
+        a_x = (self.left + self.right) / 2
+        a_y = (self.top + self.bottom) / 2
+        b_x = (other.left + other.right) / 2
+        b_y = (other.top + other.bottom) / 2
+
+        return ((a_x-b_x)**2 + (a_y-b_y)**2) ** 0.5
+
     def get_rcc8_class(self, other):
         if self.is_disconnected(other):
             return("DC")
@@ -339,6 +370,61 @@ def parse_coords(coordinates, return_box=False):
     else:
         return coords_to_box(coordinates)
 
+def parse_points(points):
+
+    # "x1,y1 x2,y2 ..." to an int32 (N,2) array, truncating as int(float(v)) does
+    if points is None or len(points) == 0:
+        return np.empty((0, 2), dtype=np.int32)
+    values = np.array(points.replace(",", " ").split(), dtype=np.float64)
+    return values.astype(np.int32).reshape(-1, 2)
+
+def points_to_box(points):
+
+    if len(points) == 0:
+        return None
+    low = points.min(axis=0)
+    high = points.max(axis=0)
+    return BoxCoords(int(low[0]), int(high[0]), int(low[1]), int(high[1]))
+
+def box_to_points(box):
+
+    # Corner points of a box, in the order pageCoord.box_to_raw writes them
+    return np.array([[box.left, box.top], [box.left, box.bottom], [box.right, box.bottom], [box.right, box.top]], dtype=np.int32)
+
+def boxes_to_box(boxes):
+
+    # BoxCoords enclosing a sequence of boxes, ignoring None entries
+    boxes = np.array([b for b in boxes if b is not None], dtype=np.int64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return None
+    low = boxes.min(axis=0)
+    high = boxes.max(axis=0)
+    return BoxCoords(int(low[0]), int(high[1]), int(low[2]), int(high[3]))
+
+def parse_points_batch(points_list):
+
+    # Parses many points strings with a single conversion and reduces every bounding box
+    # alongside it. Returns a list of (N,2) arrays (views into one buffer) and a list of
+    # BoxCoords (None for empty strings).
+    points_list = ['' if p is None else p for p in points_list]
+    counts = np.fromiter((p.count(",") for p in points_list), dtype=np.int64, count=len(points_list))
+    offsets = np.zeros(len(points_list)+1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    values = np.array(" ".join(points_list).replace(",", " ").split(), dtype=np.float64)
+    values = values.astype(np.int32).reshape(-1, 2)
+    parsed = np.split(values, offsets[1:-1])
+
+    boxes = [None] * len(points_list)
+    filled = np.flatnonzero(counts)
+    if len(filled) > 0:
+        low = np.minimum.reduceat(values, offsets[filled], axis=0).tolist()
+        high = np.maximum.reduceat(values, offsets[filled], axis=0).tolist()
+        for i, lo, hi in zip(filled.tolist(), low, high):
+            boxes[i] = BoxCoords(lo[0], hi[0], lo[1], hi[1])
+
+    return (parsed, boxes)
+
 def isnumeric(x):
 
     try:
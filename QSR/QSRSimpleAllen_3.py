@@ -3,6 +3,8 @@ from .QSRAllen import AllenIntervals
 class SimpleAllenIntervals3(AllenIntervals):
     
     description_lookup = {'XY': {1: 'before', 2: 'overlaps', 3:'after'}, 'YX': {1: 'after', 2: 'overlaps', 3:'before'}}
+
+    __slots__ = ()
                    
     def __init__(self, start_point, end_point, orientation):
         super().__init__(start_point, end_point, orientation)
@@ -5,6 +5,8 @@ class SimpleAllenIntervalsTB(AllenIntervalsTB):
     
     description_lookup = {'XY': {1: 'before', 2: 'equals', 3: 'before', 4: 'overlaps', 5: 'overlaps', 6: 'overlaps', 7: 'overlaps'},
                    'YX': {1: 'after', 2: 'equals', 3: 'after', 4: 'overlaps', 5: 'overlaps', 6: 'overlaps', 7: 'overlaps'}}
+
+    __slots__ = ()
                    
     def __init__(self, start_point, end_point, orientation='horizontal', T=0):
         super().__init__(start_point, end_point, orientation)
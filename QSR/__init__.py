@@ -5,3 +5,8 @@ from .QSRAllenTB import AllenIntervalsTB
 from .QSRSimpleTB import SimpleAllenIntervalsTB
 from .QSRRectangle import QSRRectangle
 from .QSRRectangle import BoxCoords
+from .QSRMatrix import rcc8_matrix, rcc8_pairs, RCC8_CODES, allen_matrix, allen_pairs, allen_description
+from .QSRMatrix import direction_matrix, direction_pairs, DIRECTION_CODES
+from .QSRPolygon import clip_half_plane, split_polygon, split_bands
+from .QSRCache import relationCache
+from .QSRComposition import compositionTable, relationNetwork, ALLEN_TABLE, RCC8_TABLE, rcc8_from_allen
@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+import types
+
+import pytest
+
+# The package is imported as DocQSR (the name of the checkout). Make that name resolve to this
+# tree when the repository is checked out under another directory name.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+try:
+    import DocQSR.QSR
+except ImportError:
+    package = types.ModuleType('DocQSR')
+    package.__path__ = [ROOT]
+    sys.modules['DocQSR'] = package
+
+NS = "http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15"
+
+def page_xml(regions=3, lines=5, words=4, seed=0):
+
+    # Columns of regions holding jittered lines of words
+    r = random.Random(seed)
+    out = [f'<?xml version="1.0" encoding="UTF-8"?>\n<PcGts xmlns="{NS}"><Metadata><Creator>test</Creator></Metadata>'
+           f'<Page imageFilename="img.jpg" imageWidth="2000" imageHeight="3000">']
+    for ri in range(regions):
+        rx = 100 + ri*600
+        out.append(f'<TextRegion id="tr_{ri+1}" custom="readingOrder {{index:{ri};}}"><Coords points="{rx},100 {rx},2900 {rx+550},2900 {rx+550},100"/>')
+        for li in range(lines):
+            y = 150 + li*70 + r.randint(-8, 8)
+            out.append(f'<TextLine id="r{ri+1}l{li+1}"><Coords points="{rx+10},{y+60} {rx+500},{y+60} {rx+500},{y} {rx+10},{y}"/>'
+                       f'<Baseline points="{rx+10},{y+50} {rx+250},{y+52} {rx+500},{y+50}"/>')
+            wx = rx + 10
+            texts = []
+            for wi in range(words):
+                t = f"w{ri}{li}{wi}"
+                texts.append(t)
+                out.append(f'<Word id="r{ri+1}l{li+1}w{wi+1}"><Coords points="{wx},{y+60} {wx+100},{y+60} {wx+100},{y} {wx},{y}"/>'
+                           f'<TextEquiv><Unicode>{t}</Unicode></TextEquiv></Word>')
+                wx += 100 + r.randint(5, 30)
+            out.append(f'<TextEquiv><Unicode>{" ".join(texts)}</Unicode></TextEquiv></TextLine>')
+        out.append('<TextEquiv><Unicode>region</Unicode></TextEquiv></TextRegion>')
+    out.append('</Page></PcGts>')
+    return "".join(out)
+
+@pytest.fixture
+def page_file(tmp_path):
+
+    def make(name='page.xml', **kw):
+        path = tmp_path / name
+        path.write_text(page_xml(**kw), encoding='utf-8')
+        return str(path)
+    return make
+
+def random_boxes(rng, n, extent=12, size=6):
+
+    left = rng.integers(0, extent, n)
+    top = rng.integers(0, extent, n)
+    return [(int(l), int(l+w), int(t), int(t+h)) for l, w, t, h in zip(left, rng.integers(0, size+1, n), top, rng.integers(0, size+1, n))]
@@ -0,0 +1,25 @@
+from DocQSR.PAGE import pageXML, pageWriter, pageCoord
+
+def test_replacing_a_baseline_updates_region_and_page_hashes(page_file):
+
+    for algorithm in ['md5', 'blake2b64']:
+        page = pageXML(page_file(seed=7))
+        region = page.regions[0]
+        page_hash = page.get_baseline_hash(algorithm)
+        region_hash = region.get_region_baseline_hash(algorithm).hexdigest()
+
+        region.text_lines[1].baseline = pageCoord('1,2 3,4')
+        assert region.get_region_baseline_hash(algorithm).hexdigest() != region_hash
+        assert page.get_baseline_hash(algorithm) != page_hash
+        assert page.get_baseline_hash(algorithm) == pageXML(pageWriter(page).to_bytes()).get_baseline_hash(algorithm)
+
+def test_returned_hashes_do_not_change_the_cache(page_file):
+
+    for algorithm in ['md5', 'blake2b64']:
+        page = pageXML(page_file(seed=3))
+        region = page.regions[0]
+        line = region.text_lines[0]
+        for get in [region.get_region_baseline_hash, line.get_baseline_hash]:
+            digest = get(algorithm).hexdigest()
+            get(algorithm).update(b'changed')
+            assert get(algorithm).hexdigest() == digest
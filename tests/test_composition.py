@@ -0,0 +1,73 @@
+import numpy as np
+
+from DocQSR.QSR import AllenIntervals, ALLEN_TABLE, RCC8_TABLE, relationNetwork, rcc8_from_allen
+from DocQSR.QSR import allen_pairs, rcc8_pairs
+
+def random_intervals(rng, n, extent=30):
+
+    # Positive length only: zero length intervals are outside the tables
+    starts = rng.integers(0, extent, n)
+    return (starts, starts + rng.integers(1, 10, n))
+
+def random_rectangles(rng, n, extent=30):
+
+    (left, right), (top, bottom) = random_intervals(rng, n, extent), random_intervals(rng, n, extent)
+    return np.stack([left, right, top, bottom], axis=1)
+
+def test_allen_composition_is_sound():
+
+    rng = np.random.default_rng(0)
+    starts, ends = random_intervals(rng, 3000)
+    a, b, c = rng.integers(0, len(starts), (3, 20000))
+    ab = allen_pairs(starts[a], ends[a], starts[b], ends[b], AllenIntervals)
+    bc = allen_pairs(starts[b], ends[b], starts[c], ends[c], AllenIntervals)
+    ac = allen_pairs(starts[a], ends[a], starts[c], ends[c], AllenIntervals)
+    ba = allen_pairs(starts[b], ends[b], starts[a], ends[a], AllenIntervals)
+    for x, y, z, w in zip(ab.tolist(), bc.tolist(), ac.tolist(), ba.tolist()):
+        assert ALLEN_TABLE.compose(ALLEN_TABLE.mask(x), ALLEN_TABLE.mask(y)) & ALLEN_TABLE.mask(z)
+        assert ALLEN_TABLE.converse(ALLEN_TABLE.mask(x)) == ALLEN_TABLE.mask(w)
+
+def test_rcc8_composition_is_sound():
+
+    rng = np.random.default_rng(1)
+    boxes = random_rectangles(rng, 3000)
+    a, b, c = rng.integers(0, len(boxes), (3, 20000))
+    ab, bc, ac, ba = [rcc8_pairs(boxes[x], boxes[y]) for x, y in [(a, b), (b, c), (a, c), (b, a)]]
+    for x, y, z, w in zip(ab.tolist(), bc.tolist(), ac.tolist(), ba.tolist()):
+        assert RCC8_TABLE.compose(RCC8_TABLE.mask(x), RCC8_TABLE.mask(y)) & RCC8_TABLE.mask(z)
+        assert RCC8_TABLE.converse(RCC8_TABLE.mask(x)) == RCC8_TABLE.mask(w)
+
+def test_rcc8_from_allen_matches_rcc8_pairs():
+
+    rng = np.random.default_rng(2)
+    a, b = random_rectangles(rng, 5000), random_rectangles(rng, 5000)
+    h = allen_pairs(a[:, 0], a[:, 1], b[:, 0], b[:, 1], AllenIntervals)
+    v = allen_pairs(a[:, 2], a[:, 3], b[:, 2], b[:, 3], AllenIntervals)
+    assert (rcc8_from_allen(h, v) == rcc8_pairs(a, b)).all()
+
+def check_inferred(table, true_codes, seed):
+
+    # A chain through every object plus a few random pairs, then every inferred relation
+    # must still hold the true one
+    n = len(true_codes)
+    rng = np.random.default_rng(seed)
+    sources = np.concatenate([np.arange(n-1), rng.integers(0, n, n)])
+    targets = np.concatenate([np.arange(1, n), rng.integers(0, n, n)])
+    network = relationNetwork(table, n)
+    network.add_codes(sources, targets, true_codes[sources, targets])
+    assert network.path_consistency(infer=True)
+    for i, j, mask in network.pairs():
+        assert mask & table.mask(int(true_codes[i, j]))
+    return network
+
+def test_path_consistency_keeps_the_true_relations():
+
+    rng = np.random.default_rng(3)
+    for seed in range(5):
+        boxes = random_rectangles(rng, 40, 60)
+        i, j = [x.ravel() for x in np.meshgrid(np.arange(len(boxes)), np.arange(len(boxes)), indexing='ij')]
+        rcc8 = rcc8_pairs(boxes[i], boxes[j]).reshape(len(boxes), len(boxes))
+        network = check_inferred(RCC8_TABLE, rcc8, seed)
+        assert len(network.pairs()) > 2*(len(boxes)-1)
+        allen = allen_pairs(boxes[i, 0], boxes[i, 1], boxes[j, 0], boxes[j, 1], AllenIntervals).reshape(len(boxes), len(boxes))
+        check_inferred(ALLEN_TABLE, allen, seed)
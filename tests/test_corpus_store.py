@@ -0,0 +1,57 @@
+import numpy as np
+
+from DocQSR.PAGE import pageXML, pages_to_corpus_store, write_corpus_store, corpusStore
+
+def test_store_round_trip(page_file, tmp_path):
+
+    files = [page_file(f"p{i}.xml", regions=i+1, lines=3+i, seed=i) for i in range(3)]
+    pages = [pageXML(f) for f in files]
+    store = pages_to_corpus_store(pages, str(tmp_path / 'store'))
+    store = corpusStore(str(tmp_path / 'store'))
+
+    regions = [reg for page in pages for reg in page.regions]
+    lines = [ln for reg in regions for ln in reg.text_lines]
+    words = [wd for ln in lines for wd in ln.words]
+    assert (store.page_count, store.region_count, store.line_count, store.word_count) == (3, len(regions), len(lines), len(words))
+    assert store.boxes('line').tolist() == [list(ln.coords.box) for ln in lines]
+    assert store.boxes('word').tolist() == [list(wd.coords.box) for wd in words]
+    assert store.get_strings('line_text', range(len(lines))) == [ln.text for ln in lines]
+    assert store.get_strings('word_id', range(len(words))) == [wd.id for wd in words]
+    assert [store.page_file(i) for i in range(3)] == files
+    assert store.counts_per_page('region').tolist() == [len(page.regions) for page in pages]
+
+def test_page_of(page_file, tmp_path):
+
+    pages = [pageXML(page_file(f"p{i}.xml", regions=i+1, seed=i)) for i in range(4)]
+    store = pages_to_corpus_store(pages, str(tmp_path / 'store'))
+    for level in ['region', 'line', 'baseline', 'word']:
+        expected = []
+        for i, page in enumerate(pages):
+            expected.extend([i]*len(store.page_rows(level, i)))
+        rows = np.arange(len(expected))
+        assert store.page_of(level, rows).tolist() == expected
+    line_pages = [i for i, page in enumerate(pages) for reg in page.regions for ln in reg.text_lines]
+    assert store.page_of('line', np.arange(store.line_count)).tolist() == line_pages
+
+def test_failures_are_returned(page_file, tmp_path):
+
+    good = page_file('good.xml', seed=1)
+    bad = str(tmp_path / 'bad.xml')
+    open(bad, 'w').close()
+    store, failures = write_corpus_store([good, bad], str(tmp_path / 'store'), workers=1)
+    assert store.page_count == 1
+    assert [f.file_name for f in failures] == [bad]
+
+def test_empty_corpus_has_every_column(tmp_path):
+
+    bad = str(tmp_path / 'bad.xml')
+    open(bad, 'w').close()
+    for name, paths in [('empty', []), ('failed', [bad])]:
+        store, failures = write_corpus_store(paths, str(tmp_path / name), workers=1)
+        assert len(store) == 0
+        assert store.region_count == 0
+        assert store.page_of('line', []).tolist() == []
+        assert store.boxes('word').shape == (0, 4)
+        assert store['page_region_offsets'].tolist() == [0]
+        assert store.rows_where(store.widths('line') < 100, 'line').tolist() == []
+        assert store.get_strings('line_text', []) == []
@@ -0,0 +1,45 @@
+import numpy as np
+
+from conftest import random_boxes
+from DocQSR.PAGE import pageXML, pageNeighbours, nearest_neighbours
+
+def brute_force(boxes):
+
+    boxes = np.array(boxes)
+    left, right, top, bottom = boxes.T
+    rows = np.arange(len(boxes))
+    results = {}
+    for direction in ['above', 'below', 'left', 'right']:
+        found = np.full(len(boxes), -1)
+        for i in range(len(boxes)):
+            if direction in ('above', 'below'):
+                overlap = (left <= right[i]) & (right >= left[i])
+            else:
+                overlap = (top <= bottom[i]) & (bottom >= top[i])
+            key = {'below' : top, 'above' : -bottom, 'right' : left, 'left' : -right}[direction]
+            candidates = rows[overlap & (key > key[i])]
+            if len(candidates) > 0:
+                found[i] = candidates[np.lexsort((candidates, key[candidates]))[0]]
+        results[direction] = found
+    return results
+
+def test_nearest_neighbours_match_brute_force():
+
+    rng = np.random.default_rng(3)
+    for extent in [5, 30, 500]:
+        boxes = random_boxes(rng, 300, extent, extent//3)
+        expected = brute_force(boxes)
+        found = nearest_neighbours(boxes)
+        for direction in expected:
+            assert (found[direction].rows == expected[direction]).all()
+
+def test_page_neighbours(page_file):
+
+    page = pageXML(page_file(lines=6, seed=1))
+    neighbours = pageNeighbours(page, 'line')
+    expected = brute_force(neighbours.boxes.tolist())
+    assert (neighbours['below'].rows == expected['below']).all()
+    first = page.regions[0].text_lines
+    assert neighbours.neighbour(0, 'above') is None
+    assert neighbours.neighbour(0, 'below') is first[1]
+    assert neighbours.gap(0, 'below') == first[1].top - first[0].bottom
@@ -0,0 +1,33 @@
+import pickle
+
+from DocQSR.PAGE import pageXML
+from DocQSR.QSR import AllenIntervals
+
+def test_bbox_is_one_rectangle_over_the_table_row(page_file):
+
+    page = pageXML(page_file(seed=3))
+    line = page.regions[0].text_lines[0]
+    bbox = line.coords.bbox
+    assert line.coords.bbox is bbox
+    assert bbox.bbox == line.coords.box
+
+    bbox.add_interval('horizontal', AllenIntervals)
+    bbox.set_left(bbox.left-5)
+    assert line.coords.bbox.get_interval('horizontal', AllenIntervals) is not None
+    assert line.left == bbox.left
+    assert page.geometry.lines.boxes[0, 0] == bbox.left
+
+def test_bbox_survives_a_geometry_refresh(page_file):
+
+    page = pageXML(page_file(seed=3))
+    word = page.regions[1].text_lines[2].words[1]
+    bbox = word.coords.bbox
+    bbox.set_right(bbox.right+7)
+    page._refresh_geometry()
+    assert word.coords.bbox is bbox
+    assert word.right == bbox.right
+    bbox.set_top(bbox.top-3)
+    assert word.top == bbox.top
+
+    copy = pickle.loads(pickle.dumps(page))
+    assert copy.regions[1].text_lines[2].words[1].coords.bbox.bbox == bbox.bbox
@@ -0,0 +1,37 @@
+import os
+
+from DocQSR.PAGE import pageXML, pageWriter, pageCache, save_page, load_page
+
+def test_cached_page_writes_the_same_xml(page_file, tmp_path):
+
+    page = pageXML(page_file(seed=5))
+    save_page(page, str(tmp_path / 'page.dqp'))
+    cached = load_page(str(tmp_path / 'page.dqp'))
+    assert pageWriter(cached).to_bytes() == pageWriter(page).to_bytes()
+
+def test_cache_size_is_tracked_without_rescanning(page_file, tmp_path):
+
+    files = [page_file(f"p{i}.xml", seed=i) for i in range(12)]
+    cache = pageCache(str(tmp_path / 'cache'), max_bytes=10**9)
+    scans = []
+    entries = cache.entries
+    cache.entries = lambda : scans.append(1) or entries()
+    for f in files:
+        cache.load(f)
+    assert len(scans) == 1
+    assert len(cache) == 12
+    assert cache._total_bytes == sum([os.path.getsize(os.path.join(cache.cache_dir, x)) for x in os.listdir(cache.cache_dir)])
+
+def test_cache_evicts_down_to_the_cap(page_file, tmp_path):
+
+    files = [page_file(f"p{i}.xml", seed=i) for i in range(12)]
+    cache = pageCache(str(tmp_path / 'cache'), max_bytes=10**9)
+    for f in files:
+        cache.load(f)
+    cap = cache.size() // 2
+    cache = pageCache(str(tmp_path / 'cache2'), max_bytes=cap)
+    for f in files:
+        cache.load(f)
+    assert cache.size() <= cap
+    assert cache._total_bytes == cache.size()
+    assert len(cache) == len(os.listdir(cache.cache_dir))
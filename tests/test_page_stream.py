@@ -0,0 +1,9 @@
+from DocQSR.PAGE import pageXMLStream
+
+def test_page_numbers_restart_when_iterated_again(page_file):
+
+    stream = pageXMLStream(page_file(regions=2))
+    first = [(reg.id, reg.page_number) for reg in stream]
+    assert [n for i, n in first] == [1, 1]
+    assert [(reg.id, reg.page_number) for reg in stream] == first
+    assert stream.page_count == 1
@@ -0,0 +1,25 @@
+import random
+
+from DocQSR.PAGE import pageLine, pageXML
+from DocQSR.PAGE.reading_order import reading_order
+from DocQSR.QSR import QSRRectangle, BoxCoords
+
+def make_line(r, i):
+
+    l = r.randint(0, 300)
+    t = r.randint(0, 300)
+    return pageLine({'id' : str(i), 'region_id' : 'x', 'Coords' : QSRRectangle(BoxCoords(l, l+r.randint(0, 120), t, t+r.randint(0, 40))),
+                     'Baseline' : None, 'words' : [], 'text' : ''})
+
+def test_reading_order_matches_sorted():
+
+    r = random.Random(5)
+    for trial in range(200):
+        lines = [make_line(r, i) for i in range(r.randint(1, 60))]
+        assert [x.id for x in reading_order(lines)] == [x.id for x in sorted(lines)]
+
+def test_region_iteration_uses_reading_order(page_file):
+
+    page = pageXML(page_file(lines=12, seed=3))
+    for reg in page:
+        assert [x.id for x in reg] == [x.id for x in sorted(reg.text_lines)]
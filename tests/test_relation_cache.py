@@ -0,0 +1,21 @@
+from DocQSR.QSR import QSRRectangle, BoxCoords, AllenIntervals, AllenIntervalsTB, relationCache
+
+def test_cached_allen_follows_changed_sides():
+
+    cache = relationCache()
+    a = QSRRectangle(BoxCoords(0, 10, 0, 10))
+    b = QSRRectangle(BoxCoords(20, 40, 0, 10))
+    assert cache.allen(a, b)['description'] == 'before'
+    a.add_interval('horizontal', AllenIntervals)
+    a.set_left(25)
+    a.set_right(30)
+    assert cache.allen(a, b)['description'] == 'during'
+    assert cache.allen(QSRRectangle(BoxCoords(25, 30, 0, 10)), b)['description'] == 'during'
+
+def test_cached_allen_tolerance_is_part_of_the_key():
+
+    cache = relationCache()
+    a = QSRRectangle(BoxCoords(0, 19, 0, 10))
+    b = QSRRectangle(BoxCoords(20, 40, 0, 10))
+    assert cache.allen(a, b, interval_class=AllenIntervalsTB)['description'] == 'before'
+    assert cache.allen(a, b, interval_class=AllenIntervalsTB, T=2)['description'] == 'meets'
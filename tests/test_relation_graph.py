@@ -0,0 +1,40 @@
+import numpy as np
+
+from conftest import random_boxes
+from DocQSR.PAGE import pageXML, pageRelationGraph, candidate_pairs
+from DocQSR.QSR import QSRRectangle, BoxCoords, AllenIntervals, RCC8_CODES, DIRECTION_CODES
+
+def brute_force_pairs(boxes, max_gap):
+
+    pairs = set()
+    for i, a in enumerate(boxes):
+        for j, b in enumerate(boxes):
+            if i != j and a[0]-b[1] <= max_gap and b[0]-a[1] <= max_gap and a[2]-b[3] <= max_gap and b[2]-a[3] <= max_gap:
+                pairs.add((i, j))
+    return pairs
+
+def test_candidate_pairs_match_brute_force():
+
+    rng = np.random.default_rng(3)
+    for extent, max_gap in [(12, 0), (12, 2), (200, 10), (200, 40)]:
+        boxes = random_boxes(rng, 200, extent, 20)
+        src, dst = candidate_pairs(np.array(boxes), max_gap)
+        assert set(zip(src.tolist(), dst.tolist())) == brute_force_pairs(boxes, max_gap)
+
+def test_graph_relations_match_scalar(page_file):
+
+    page = pageXML(page_file(lines=8, seed=2))
+    for level in ['region', 'line', 'word']:
+        graph = pageRelationGraph(page, level)
+        boxes = graph.boxes.tolist()
+        assert set(zip(*[x.tolist() for x in graph.edges()])) == brute_force_pairs(boxes, graph.max_gap)
+        rects = [QSRRectangle(BoxCoords(*b)) for b in boxes]
+        for i, j in zip(*[x.tolist() for x in graph.edges()]):
+            described = graph.describe(i, j)
+            assert described['rcc8'] == rects[i].get_rcc8_class(rects[j])
+            assert described['direction'] == DIRECTION_CODES[rects[i].get_direction_of_other(rects[j])]
+            h = AllenIntervals(boxes[i][0], boxes[i][1], 'horizontal').get_relationship(AllenIntervals(boxes[j][0], boxes[j][1], 'horizontal'))
+            v = AllenIntervals(boxes[i][2], boxes[i][3], 'vertical').get_relationship(AllenIntervals(boxes[j][2], boxes[j][3], 'vertical'))
+            assert described['allen_h'] == h
+            assert described['allen_v'] == v
+        assert graph.relation(0, 0, 'rcc8') is None
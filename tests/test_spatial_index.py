@@ -0,0 +1,41 @@
+import numpy as np
+
+from DocQSR.PAGE import pageXML
+from DocQSR.PAGE.spatial_index import box_gaps
+
+def test_nearest_matches_full_scan(page_file):
+
+    page = pageXML(page_file(lines=15, words=6, seed=4))
+    index = page.spatial_index
+    rng = np.random.default_rng(0)
+    for level in ['word', 'line', 'region']:
+        boxes = index.grids[level].table.boxes
+        for _ in range(200):
+            x, y = int(rng.integers(-500, 2500)), int(rng.integers(-500, 3500))
+            w, h = int(rng.integers(0, 300)), int(rng.integers(0, 100))
+            k = int(rng.integers(1, 10))
+            gaps = box_gaps(boxes, x, x+w, y, y+h)
+            expected = np.lexsort((np.arange(len(boxes)), gaps))[:k]
+            assert (index.nearest((x, x+w, y, y+h), k, level, return_rows=True) == expected).all()
+
+def test_query_intersecting_matches_full_scan(page_file):
+
+    page = pageXML(page_file(lines=15, words=6, seed=4))
+    index = page.spatial_index
+    boxes = index.grids['word'].table.boxes
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        x, y = int(rng.integers(0, 2000)), int(rng.integers(0, 1500))
+        left, right, top, bottom = x, x+int(rng.integers(0, 400)), y, y+int(rng.integers(0, 200))
+        expected = np.nonzero((boxes[:, 0] <= right) & (boxes[:, 1] >= left) & (boxes[:, 2] <= bottom) & (boxes[:, 3] >= top))[0]
+        assert sorted(index.query_intersecting((left, right, top, bottom), 'word', return_rows=True).tolist()) == expected.tolist()
+
+def test_nearest_far_from_the_page(page_file):
+
+    page = pageXML(page_file(lines=15, words=6, seed=4))
+    index = page.spatial_index
+    boxes = index.grids['word'].table.boxes
+    for x, y in [(10**7, 100), (-10**7, -10**7), (500, 10**7), (10**7, -10**7)]:
+        gaps = box_gaps(boxes, x, x+10, y, y+10)
+        expected = np.lexsort((np.arange(len(boxes)), gaps))[:3]
+        assert (index.nearest((x, x+10, y, y+10), 3, 'word', return_rows=True) == expected).all()
@@ -0,0 +1,142 @@
+import pickle
+
+import lxml.etree
+
+from DocQSR.PAGE import pageXML, pageWriter, save_page, load_page
+
+# Indented like a Transkribus export, with children the model does not hold
+RICH_PAGE = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<PcGts xmlns="http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15 http://schema.primaresearch.org/PAGE/gts/pagecontent/2013-07-15/pagecontent.xsd">
+    <Metadata>
+        <Creator>prov=test</Creator>
+        <Created>2020-01-01T00:00:00</Created>
+        <LastChange>2020-01-01T00:00:00</LastChange>
+    </Metadata>
+    <Page imageFilename="img.jpg" imageWidth="2000" imageHeight="3000">
+        <ReadingOrder>
+            <OrderedGroup id="ro_1" caption="Regions reading order">
+                <RegionRefIndexed index="0" regionRef="r1"/>
+                <RegionRefIndexed index="1" regionRef="r2"/>
+            </OrderedGroup>
+        </ReadingOrder>
+        <TextRegion orientation="0.0" id="r1" custom="readingOrder {index:0;}">
+            <Coords points="100,100 100,400 900,400 900,100"/>
+            <!-- checked -->
+            <TextLine id="r1l1" custom="readingOrder {index:0;}">
+                <Coords points="110,160 890,160 890,110 110,110" conf="0.9"/>
+                <Baseline points="110,150 890,150"/>
+                <Word id="r1l1w1">
+                    <Coords points="110,160 300,160 300,110 110,110"/>
+                    <Glyph id="r1l1w1g1">
+                        <Coords points="110,160 150,160 150,110 110,110"/>
+                        <TextEquiv><Unicode>H</Unicode></TextEquiv>
+                    </Glyph>
+                    <TextEquiv conf="0.8"><Unicode>Hello</Unicode></TextEquiv>
+                </Word>
+                <Word id="r1l1w2">
+                    <Coords points="500,160 890,160 890,110 500,110"/>
+                    <TextEquiv><Unicode>world</Unicode></TextEquiv>
+                </Word>
+                <TextEquiv conf="0.85">
+                    <PlainText>Hello world</PlainText>
+                    <Unicode>Hello world</Unicode>
+                </TextEquiv>
+                <TextStyle fontSize="12.0" bold="true"/>
+            </TextLine>
+            <TextLine id="r1l2" custom="readingOrder {index:1;}">
+                <Coords points="110,260 890,260 890,210 110,210"/>
+                <Baseline points="110,250 890,250"/>
+            </TextLine>
+            <TextEquiv>
+                <Unicode>Region text</Unicode>
+            </TextEquiv>
+            <TextRegion id="r1n1">
+                <Coords points="120,300 120,390 200,390 200,300"/>
+            </TextRegion>
+        </TextRegion>
+        <TextRegion id="r2" custom="readingOrder {index:1;}">
+            <Coords points="100,500 100,600 900,600 900,500"/>
+        </TextRegion>
+        <SeparatorRegion id="s1">
+            <Coords points="950,100 950,900 960,900 960,100"/>
+        </SeparatorRegion>
+    </Page>
+</PcGts>
+"""
+
+def c14n(data):
+
+    return lxml.etree.tostring(lxml.etree.fromstring(data), method='c14n')
+
+def test_unmodified_pages_round_trip(page_file):
+
+    for data in [RICH_PAGE.encode('utf-8'), open(page_file(seed=2), 'rb').read()]:
+        assert c14n(pageWriter(pageXML(data)).to_bytes()) == c14n(data)
+
+def test_pickled_and_cached_pages_keep_unmodelled_children(tmp_path):
+
+    page = pageXML(RICH_PAGE.encode('utf-8'))
+    expected = lxml.etree.fromstring(pageWriter(page).to_bytes())
+    save_page(page, str(tmp_path / 'page.dqp'))
+    for copy in [pickle.loads(pickle.dumps(page)), load_page(str(tmp_path / 'page.dqp'))]:
+        written = lxml.etree.fromstring(pageWriter(copy).to_bytes())
+        for path in ['//{*}TextStyle', '//{*}Glyph', '//{*}PlainText', '//{*}TextRegion/{*}TextRegion',
+                     '//{*}SeparatorRegion', '//{*}ReadingOrder', '//{*}TextEquiv[@conf]', '//comment()']:
+            assert len(written.xpath(path.replace('{*}', 'p:'), namespaces={'p' : expected.nsmap[None]})) == \
+                   len(expected.xpath(path.replace('{*}', 'p:'), namespaces={'p' : expected.nsmap[None]}))
+        assert written.attrib == expected.attrib
+
+def test_edited_text_replaces_text_equiv():
+
+    page = pageXML(RICH_PAGE.encode('utf-8'))
+    line = page.regions[0].text_lines[0]
+    line.words[0].update_text('Hallo')
+    line.text = 'Hallo world'
+    written = lxml.etree.fromstring(pageWriter(page).to_bytes())
+    ns = {'p' : written.nsmap[None]}
+    assert written.xpath('//p:Word[@id="r1l1w1"]/p:TextEquiv/p:Unicode/text()', namespaces=ns) == ['Hallo']
+    assert written.xpath('//p:TextLine[@id="r1l1"]/p:TextEquiv/p:Unicode/text()', namespaces=ns) == ['Hallo world']
+    # The glyph and style are still there; the region text is kept
+    assert len(written.xpath('//p:Glyph', namespaces=ns)) == 1
+    assert len(written.xpath('//p:TextLine[@id="r1l1"]/p:TextStyle', namespaces=ns)) == 1
+    assert written.xpath('//p:TextRegion[@id="r1"]/p:TextEquiv/p:Unicode/text()', namespaces=ns) == ['Region text']
+
+def test_split_region_text_comes_from_its_lines(page_file):
+
+    page = pageXML(page_file(regions=1, lines=4, words=4, seed=1))
+    page.split_region_horizontal('tr_1', 350)
+    written = lxml.etree.fromstring(pageWriter(page).to_bytes())
+    ns = {'p' : written.nsmap[None]}
+    for reg in page.regions:
+        text = written.xpath(f'//p:TextRegion[@id="{reg.id}"]/p:TextEquiv/p:Unicode/text()', namespaces=ns)
+        assert text == ["\n".join([ln.text for ln in reg.text_lines])]
+
+def test_split_regions_are_renumbered_in_reading_order():
+
+    page = pageXML(RICH_PAGE.encode('utf-8'))
+    page.split_region_horizontal('r1', 400)
+    assert len(page.regions) == 3
+    written = lxml.etree.fromstring(pageWriter(page).to_bytes())
+    ns = {'p' : written.nsmap[None]}
+    refs = written.xpath('//p:ReadingOrder/p:OrderedGroup/p:RegionRefIndexed', namespaces=ns)
+    assert [(x.get('index'), x.get('regionRef')) for x in refs] == [('0', 'r1'), ('1', page.regions[2].id), ('2', 'r2')]
+    for x in refs:
+        region = written.xpath(f'//p:Page/p:TextRegion[@id="{x.get("regionRef")}"]', namespaces=ns)[0]
+        assert region.get('custom') == f"readingOrder {{index:{x.get('index')};}}"
+        lines = region.xpath('p:TextLine', namespaces=ns)
+        assert [ln.get('custom') for ln in lines] == [f"readingOrder {{index:{i};}}" for i in range(len(lines))]
+    # The nested region stays with the piece that keeps the region id
+    assert len(written.xpath('//p:TextRegion[@id="r1"]/p:TextRegion', namespaces=ns)) == 1
+    assert len(written.xpath('//p:TextRegion/p:TextRegion', namespaces=ns)) == 1
+
+def test_save_to_file_warns_instead_of_overwriting(page_file, caplog):
+
+    path = page_file()
+    with open(path, 'rb') as f:
+        before = f.read()
+    page = pageXML(path)
+    page.regions[0].text_lines[0].text = 'changed'
+    page.save_to_file(path)
+    assert 'overwrite=True' in caplog.text
+    with open(path, 'rb') as f:
+        assert f.read() == before